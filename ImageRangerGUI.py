@@ -25,7 +25,6 @@ import threading
 import time
 import queue
 import itertools
-import gc
 import sys, subprocess
 
 import tkinter as tk
@@ -36,6 +35,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from PIL import Image, ImageTk
 from undo_stack import UndoStack
+import file_ops
 from pathlib import Path
 
 
@@ -80,6 +80,33 @@ _THUMB_CACHE_MAX = 400
 
 THUMBNAIL_SIZE = (100, 100)
 DB_PATH = "reference_data.db"
+_IMG_EXTS = frozenset({"jpg", "jpeg", "png", "bmp", "webp"})  # lowercase, no dot
+
+# ---- Session caches -------------------------------------
+# get_label_folder_path() resolves the reference root and makedirs() on every
+# call; one labeling click used to do that several times per label.
+_LABEL_FOLDERS = {}  # label -> folder; cleared when the reference root may have moved
+_get_label_folder_path_uncached = get_label_folder_path
+
+def get_label_folder_path(label: str) -> str:
+    folder = _LABEL_FOLDERS.get(label)
+    if folder and os.path.isdir(folder):
+        return folder
+    folder = _get_label_folder_path_uncached(label)
+    _LABEL_FOLDERS[label] = folder
+    return folder
+
+def _has_references() -> bool:
+    """True if at least one reference row exists (no full table read)."""
+    try:
+        import sqlite3
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            return conn.execute("SELECT 1 FROM reference_entries LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+    except Exception:
+        return bool(get_all_references())
 
 def _thumbcache_get(key):
     if key in _THUMB_CACHE:
@@ -104,6 +131,36 @@ def _ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
 
+def _iter_images(folder: str, exts=_IMG_EXTS):
+    """
+    Recursively yield image paths under `folder` using os.scandir.
+    DirEntry carries the file type from the directory read, so there is no
+    per-entry stat (os.walk stats every entry on Windows/macOS). Iterative, so
+    deep trees don't stack up nested generators or hit the recursion limit.
+    """
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        # one rpartition + hash probe instead of endswith over a tuple
+                        _stem, dot, ext = entry.name.rpartition(".")
+                        if dot and ext.lower() in exts and entry.is_file():
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        # files first, then subfolders in listing order — same as os.walk
+        stack.extend(reversed(subdirs))
+
+
 def _unique_path(dest_dir: Path, name: str) -> Path:
     """
     Make a unique destination path by suffixing -1, -2, ... if needed.
@@ -161,6 +218,21 @@ except Exception:  # pragma: no cover
     def purge_missing_references() -> int:
         return 0
 
+# One transaction (one fsync) for N rows when reference_db provides it; otherwise
+# the per-row API, skipping (logging) a row that fails rather than abort the batch.
+try:
+    from reference_db import insert_references_bulk
+except Exception:  # pragma: no cover
+    def insert_references_bulk(pairs) -> int:
+        added = 0
+        for path, label in pairs:
+            try:
+                insert_reference(path, label)
+                added += 1
+            except Exception as e:
+                print(f"⚠️ Could not insert reference {path}: {e}")
+        return added
+
 from photo_sorter import (
     build_reference_embeddings_from_db,
     sort_photos_with_embeddings_from_folder_using_db
@@ -196,29 +268,9 @@ def _labels_from_entries() -> list[str]:
         return []
     
 
-def _safe_copy_to_label_folder(src_path: str, label: str, keep_original_name: bool = True) -> str:
-    """
-    Copy src_path into ReferenceRoot/<label>/ collision-safely; return destination path.
-    """
-    folder = get_label_folder_path(label)
-    base = os.path.basename(src_path)
-    if keep_original_name:
-        name, ext = os.path.splitext(base)
-        candidate = os.path.join(folder, base)
-        if not os.path.exists(candidate):
-            shutil.copy2(src_path, candidate)
-            return candidate
-        i = 2
-        while True:
-            candidate = os.path.join(folder, f"{name}_{i}{ext}")
-            if not os.path.exists(candidate):
-                shutil.copy2(src_path, candidate)
-                return candidate
-            i += 1
-    else:
-        dst = os.path.join(folder, f"{uuid.uuid4().hex[:8]}_{base}")
-        shutil.copy2(src_path, dst)
-        return dst
+def _copy_to_label_folder_many(paths, label: str) -> tuple[list[str], list[tuple[str, Exception]]]:
+    """Copy `paths` into ReferenceRoot/<label>/ collision-safely; returns (copied, failed)."""
+    return file_ops.copy_many_into(paths, get_label_folder_path(label))
 
 def _write_or_refresh_metadata(label: str, threshold: float | None = None):
     """
@@ -325,10 +377,32 @@ class BottomLogFrame(tk.Frame):
         self.text.configure(yscrollcommand=self.scroll.set)
         self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        # log() may be called from worker threads; lines are queued and drained
+        # on the Tk thread in one insert per tick instead of one per message.
+        self._pending = queue.Queue()
+        self.after(self.DRAIN_MS, self._drain)
+
+    MAX_LINES = 5000   # keep the Text widget small; inserts slow down as it grows
+    DRAIN_MS = 100
 
     def log(self, msg):
+        self._pending.put(msg)  # thread-safe; never touches Tk
+
+    def _drain(self):
+        self.after(self.DRAIN_MS, self._drain)
+        lines = []
+        try:
+            while True:
+                lines.append(str(self._pending.get_nowait()))
+        except queue.Empty:
+            pass
+        if not lines:
+            return
         try:
-            self.text.insert(tk.END, msg + "\n")
+            self.text.insert(tk.END, "\n".join(lines) + "\n")
+            extra = int(self.text.index("end-1c").split(".")[0]) - self.MAX_LINES
+            if extra > 0:
+                self.text.delete("1.0", f"{extra + 1}.0")
             self.text.see(tk.END)
         except Exception:
             self.text.insert(tk.END, "[log error]\n")
@@ -451,11 +525,7 @@ class MatchReviewPanel(tk.Toplevel):
         self._thumbs.clear()
         self._checks.clear()
 
-        paths = []
-        for sub, _, files in os.walk(self.unmatched_dir):
-            for f in files:
-                if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp")):
-                    paths.append(os.path.join(sub, f))
+        paths = list(_iter_images(self.unmatched_dir))
 
         if not paths:
             self.gui_log("ℹ️ No images in unmatched folder.")
@@ -848,6 +918,8 @@ class ImageRangerGUI:
         self.selected_folder = tk.StringVar()
         self.image_paths = []
         self.thumbnails = []
+        self._grid_paths = []                # paths in grid order, parallel to self.thumbnails
+        self._grid_layout = None             # (thumb size, columns) the current cells were built for
         
         #self.last_applied_thumb_size = None  # ✅ Fix: initialize this to avoid attribute error
         self.last_applied_thumb_size = self.settings.get("thumbnail_size", (120, 120))[0]
@@ -865,6 +937,8 @@ class ImageRangerGUI:
     
         # async/undo helpers
         self._rebuild_pending = None
+        self._meta_after_id = None           # Tk 'after' handle for metadata.json refreshes
+        self._pending_meta_refresh = set()   # labels whose metadata.json is stale
         self.undo_stack = UndoStack()
         self.undo = self.undo_stack  # ✅ alias so both old and new references work
     
@@ -919,6 +993,7 @@ class ImageRangerGUI:
         from settings_manager import SettingsDialog
         dlg = SettingsDialog(self.root, self.settings)
         self.root.wait_window(dlg)  # wait until user closes
+        _LABEL_FOLDERS.clear()  # reference root may have changed
         # Re-apply visuals with new settings
         self.apply_styles()
         self.apply_main_selection_styles_after_settings()
@@ -1048,22 +1123,26 @@ class ImageRangerGUI:
 
     
     def _cancel_thumb_job(self):
-        self._thumb_stop = True
+        stop = getattr(self, "_thumb_stop", None)
+        if stop is not None:
+            stop.set()
 
     def _start_thumb_job(self, paths):
         self._cancel_thumb_job()
-        self._thumb_stop = False
+        # per-job queue + stop flag: a cancelled producer/consumer pair can't
+        # feed cells into the job that replaced it
+        stop = self._thumb_stop = threading.Event()
         self._thumb_executor = getattr(self, "_thumb_executor", None) or ThreadPoolExecutor(max_workers=4)
-        self._thumb_queue = queue.Queue(maxsize=256)
+        q = self._thumb_queue = queue.Queue(maxsize=256)
 
         def producer():
             for p in paths:
-                if self._thumb_stop:
+                if stop.is_set():
                     break
                 #cached = _thumbcache_get(p)
                 cached = self.settings.thumb_cache.get(p)
                 if cached is not None:
-                    self._thumb_queue.put(("ok", p, cached))
+                    q.put(("ok", p, cached))
                     continue
                 try:
                     thumb_size = self.settings.get("thumbnail_size", (120, 120))
@@ -1072,27 +1151,26 @@ class ImageRangerGUI:
                         im.thumbnail(thumb_size)
                         bio = im.tobytes()
                         size = im.size
-                    self._thumb_queue.put(("raw", p, (bio, size)))
+                    q.put(("raw", p, (bio, size)))
                 except Exception as e:
-                    self._thumb_queue.put(("err", p, str(e)))
-            self._thumb_queue.put(("done", None, None))
+                    q.put(("err", p, str(e)))
+            q.put(("done", None, None))
 
         threading.Thread(target=producer, daemon=True).start()
-        self._consume_thumbs_batch()
+        self._consume_thumbs_batch(q, stop)
 
-    def _consume_thumbs_batch(self):
+    def _consume_thumbs_batch(self, q, stop):
         BATCH = 24
         consumed = 0
         while consumed < BATCH:
+            if stop.is_set():
+                return
             try:
-                kind, path, payload = self._thumb_queue.get_nowait()
+                kind, path, payload = q.get_nowait()
             except queue.Empty:
                 break
             if kind == "done":
-                gc.collect()
                 return
-            if self._thumb_stop:
-                continue
             if kind == "ok":
                 thumb = payload
                 self._add_thumbnail_widget(path, thumb)
@@ -1109,8 +1187,8 @@ class ImageRangerGUI:
             else:
                 self.gui_log(f"[Thumbnail error] {path}: {payload}")
             consumed += 1
-        if not self._thumb_stop:
-            self.root.after(10, self._consume_thumbs_batch)
+        if not stop.is_set():
+            self.root.after(10, self._consume_thumbs_batch, q, stop)
 
 
     def _apply_main_selection_style(self, path, selected=False):
@@ -1130,6 +1208,7 @@ class ImageRangerGUI:
     def _add_thumbnail_widget(self, img_path, tkimg):
         idx = len(self.thumbnails)
         self.thumbnails.append(tkimg)
+        self._grid_paths.append(img_path)
     
         color = self.settings.get("main_grid_sel_color")
         thickness = int(self.settings.get("main_grid_sel_border"))
@@ -1173,11 +1252,36 @@ class ImageRangerGUI:
         self._apply_main_selection_style(img_path, selected=(img_path in self.selected_images))
 
     
+    def _clear_main_selection(self):
+        """Drop the selection and un-highlight only the cells that were selected."""
+        was, self.selected_images = self.selected_images, set()
+        for path in was:
+            if path in self.thumb_cells:
+                self._apply_main_selection_style(path, selected=False)
+
     def apply_main_selection_styles_after_settings(self):
         # Re-apply (e.g. after user changes color/thickness in Preferences)
         for path, node in self.thumb_cells.items():
             self._apply_main_selection_style(path, selected=(path in self.selected_images))
 
+    # ----- metadata.json refresh (debounced) --------
+    def schedule_metadata_refresh(self, label, delay_ms=500):
+        """Queue a metadata.json refresh; each label is rewritten once per window."""
+        if not label:
+            return
+        self._pending_meta_refresh.add(label)
+        if self._meta_after_id is None:
+            self._meta_after_id = self.root.after(delay_ms, self._flush_pending_meta)
+
+    def _flush_pending_meta(self):
+        self._meta_after_id = None
+        labels, self._pending_meta_refresh = self._pending_meta_refresh, set()
+        for label in labels:
+            try:
+                _write_or_refresh_metadata(label)
+            except Exception:
+                pass
+
     # ----- embeddings rebuild (debounced + threaded) --------
     def rebuild_embeddings_async(self, only_label: str | None = None):
         if getattr(self, "_rebuild_pending", None):
@@ -1573,11 +1677,7 @@ class ImageRangerGUI:
         self.image_queue = queue.Queue()
 
         def scan_worker():
-            all_images = []
-            for root, dirs, files in os.walk(folder):
-                for f in files:
-                    if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp")):
-                        all_images.append(os.path.join(root, f))
+            all_images = [p for p in _iter_images(folder)]
 
             total = len(all_images)
             self.root.after(0, lambda: self.progress_popup.set_total(total))
@@ -1629,7 +1729,8 @@ class ImageRangerGUI:
                 if t == "delete_refs":
                     label = data.get("label")
                     entries = data.get("items", [])
-                    restored = 0
+                    moved_back = []
+                    made = set()  # parent dirs already ensured this pass
 
                     for e in entries:
                         # Support both new and legacy keys
@@ -1638,26 +1739,38 @@ class ImageRangerGUI:
                         if not backup or not orig:
                             continue
                         try:
-                            os.makedirs(os.path.dirname(orig), exist_ok=True)
-                            if os.path.exists(backup):
-                                shutil.move(backup, orig)
-                                insert_reference(orig, label)
-                                self.gui_log(f"✅ Restored reference: {orig}")
-                                restored += 1
+                            d = os.path.dirname(orig)
+                            if d not in made:
+                                os.makedirs(d, exist_ok=True)
+                                made.add(d)
+                            file_ops.move_path(backup, orig)
+                            moved_back.append(orig)
+                            self.gui_log(f"✅ Restored reference: {orig}")
+                        except FileNotFoundError:
+                            pass  # backup already gone; nothing to restore
                         except Exception as ex:
                             self.gui_log(f"❌ Undo restore failed for {orig}: {ex}")
 
-                    if label:
-                        try:
-                            _write_or_refresh_metadata(label)
-                        except Exception:
-                            pass
+                    # all DB rows in one go once the files are back
+                    restored = 0
+                    try:
+                        restored = insert_references_bulk([(p, label) for p in moved_back])
+                    except Exception as ex:
+                        self.gui_log(f"❌ Undo DB restore failed: {ex}")
+
+                    # nothing came back (e.g. backups gone after a crash): skip the
+                    # metadata rewrite and, above all, the embedding rebuild
+                    if label and moved_back:
+                        self.schedule_metadata_refresh(label)
 
                         # Refresh UI + embeddings
-                        self.reference_browser.refresh_label_list(auto_select=False)
-                        if self.reference_browser.label_filter.get() == label:
-                            self.reference_browser.load_images()
-                        self.rebuild_embeddings_async(only_label=label)
+                        rb = self.reference_browser
+                        shown = rb.label_filter.get()
+                        rb.refresh_label_list(auto_select=False)
+                        if shown == label:
+                            rb.load_images()
+                        if restored:
+                            self.rebuild_embeddings_async(only_label=label)
 
                     self.gui_log(f"↩ Restored {restored} reference(s) to '{label}'.")
                     return
@@ -1688,22 +1801,17 @@ class ImageRangerGUI:
 
                     try:
                         os.makedirs(os.path.dirname(dest_folder), exist_ok=True)
-                        shutil.move(trashed_folder, dest_folder)
+                        file_ops.restore_folder(trashed_folder, dest_folder)
                     except Exception as ex:
                         self.gui_log(f"❌ Undo restore of label failed: {ex}")
                         return
 
                     # Reinsert DB entries
-                    restored = 0
-                    for root_dir, _, files in os.walk(dest_folder):
-                        for f in files:
-                            if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp")):
-                                full = os.path.join(root_dir, f)
-                                try:
-                                    insert_reference(full, label)
-                                    restored += 1
-                                except Exception:
-                                    pass
+                    try:
+                        restored = insert_references_bulk(
+                            [(full, label) for full in _iter_images(dest_folder)])
+                    except Exception:
+                        restored = 0
 
                     try:
                         set_threshold_for_label(label, thr)
@@ -1791,13 +1899,6 @@ class ImageRangerGUI:
     def display_thumbnails(self):
         if not self.image_paths:
             return
-    
-        # Clear previous thumbnail widgets
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        self.thumbnails.clear()
-        self.thumb_cells.clear()
-        gc.collect()
 
         # 🧭 Sync zoom bar and size
         zoom_size = self.settings.get("thumbnail_size", (120, 120))[0]
@@ -1811,13 +1912,36 @@ class ImageRangerGUI:
         self.dynamic_columns = columns  # store for use in thumbnail placement
         
         print(f"[DEBUG] Canvas: {canvas_width}, Columns: {columns}")
-        
-        #self.last_applied_thumb_size = int(self.zoom_slider.get())
 
-        # start background building
-        self._start_thumb_job(self.image_paths)
+        # Stop the running stream first: cells it would still append may belong
+        # to paths that are gone (e.g. the new list is a prefix of the old one).
+        self._cancel_thumb_job()
 
-        self.scrollable_frame.update_idletasks()
+        # Keep the cells whose path is unchanged (common prefix) when the layout
+        # is the same; only the tail is torn down and streamed in again.
+        layout = (self.last_applied_thumb_size, columns)
+        k = 0
+        if layout == self._grid_layout:
+            old, new = self._grid_paths, self.image_paths
+            limit = min(len(old), len(new))
+            while k < limit and old[k] == new[k]:
+                k += 1
+        for p in self._grid_paths[k:]:
+            node = self.thumb_cells.pop(p, None)
+            if node:
+                node["cell"].destroy()
+        if k == 0:
+            # anything not tracked (placeholders, stale cells) goes too
+            for widget in self.scrollable_frame.winfo_children():
+                widget.destroy()
+            self.thumb_cells.clear()
+        del self.thumbnails[k:]
+        del self._grid_paths[k:]
+        self._grid_layout = layout
+
+        # start background building for the new tail only
+        if k < len(self.image_paths):
+            self._start_thumb_job(self.image_paths[k:])
 
 
     # ---------------- label flows ----------------
@@ -1830,20 +1954,20 @@ class ImageRangerGUI:
         if not dlg.result:
             return
         label, threshold = dlg.result
-        for path in self.selected_images:
-            dst = _safe_copy_to_label_folder(path, label, keep_original_name=True)
-            insert_reference(dst, label)
+        copied, failed = _copy_to_label_folder_many(sorted(self.selected_images), label)
+        for src, err in failed:
+            self.gui_log(f"❌ Could not copy {src} to '{label}': {err}")
+        insert_references_bulk([(dst, label) for dst in copied])
         set_threshold_for_label(label, threshold)
         default_folder = get_label_folder_path(label)
         os.makedirs(default_folder, exist_ok=True)
         insert_or_update_label(label, default_folder, threshold)
-        _write_or_refresh_metadata(label, threshold)
-        messagebox.showinfo("Saved", f"{len(self.selected_images)} images labeled as '{label}'")
-        self.selected_images.clear()
-        self.display_thumbnails()
-        self.reference_browser.refresh_label_list()
-        self.reference_browser.label_filter.set(label)
-        self.reference_browser.load_images()
+        self.schedule_metadata_refresh(label)  # threshold is stored above
+        messagebox.showinfo("Saved", f"{len(copied)} images labeled as '{label}'")
+        self._clear_main_selection()
+        # let the dialog dismiss first; the grid/browser redraw on the next idle tick
+        self.root.after_idle(self.display_thumbnails)
+        self.root.after_idle(self._show_reference_label, label)
         self.gui_log(f"🏷️ Labeled images as '{label}' (threshold {threshold}). Rebuilding embeddings…")
         self.rebuild_embeddings_async(only_label=label)
 
@@ -1852,6 +1976,7 @@ class ImageRangerGUI:
             messagebox.showwarning("No Selection", "Select photos in the main grid first.")
             return
         current_label = self.reference_browser.label_filter.get()
+        shown = current_label  # the browser keeps showing this label throughout
         if not current_label:
             dlg = CreateLabelDialog(self.root, initial_name="", initial_threshold=0.3)
             self.root.wait_window(dlg)
@@ -1862,35 +1987,36 @@ class ImageRangerGUI:
             os.makedirs(default_folder, exist_ok=True)
             set_threshold_for_label(current_label, thr)
             insert_or_update_label(current_label, default_folder, thr)
-            _write_or_refresh_metadata(current_label, thr)
-        for p in self.selected_images:
-            dst = _safe_copy_to_label_folder(p, current_label, keep_original_name=True)
-            insert_reference(dst, current_label)
-        _write_or_refresh_metadata(current_label)
-        self.gui_log(f"➕ Added {len(self.selected_images)} image(s) to reference label '{current_label}'. Rebuilding embeddings…")
-        messagebox.showinfo("Reference", f"Added {len(self.selected_images)} image(s) to '{current_label}'.")
-        self.selected_images.clear()
-        self.display_thumbnails()
-        self.reference_browser.refresh_label_list(auto_select=False)
-        if self.reference_browser.label_filter.get() == current_label:
-            self.reference_browser.load_images()
+        copied, failed = _copy_to_label_folder_many(sorted(self.selected_images), current_label)
+        for src, err in failed:
+            self.gui_log(f"❌ Could not copy {src} to '{current_label}': {err}")
+        insert_references_bulk([(dst, current_label) for dst in copied])
+        self.schedule_metadata_refresh(current_label)
+        self.gui_log(f"➕ Added {len(copied)} image(s) to reference label '{current_label}'. Rebuilding embeddings…")
+        messagebox.showinfo("Reference", f"Added {len(copied)} image(s) to '{current_label}'.")
+        self._clear_main_selection()
+        # let the dialog dismiss first; the grid/browser redraw on the next idle tick
+        self.root.after_idle(self.display_thumbnails)
+        self.root.after_idle(self._show_reference_label, None, shown == current_label)
         self.rebuild_embeddings_async(only_label=current_label)
 
+    def _show_reference_label(self, label=None, reload_images=True):
+        """Refresh the browser's label list, optionally switch to `label`, reload its images."""
+        rb = self.reference_browser
+        rb.refresh_label_list(auto_select=False)
+        if label:
+            rb.label_filter.set(label)
+        if reload_images:
+            rb.load_images()
+
     # ---------------- sorting flow ----------------
     def start_sort_flow(self):
-        ref_list = get_all_references()
-        if not ref_list:
+        if not _has_references():
             messagebox.showwarning("No References", "Please label reference images first.")
             return
         model_dir = os.path.join(os.path.dirname(__file__), "buffalo_l")
         def log_callback(msg):
             self.gui_log(msg)
-        self.gui_log("⚙️ Building reference embeddings…")
-        try:
-            build_reference_embeddings_from_db(DB_PATH, model_dir, log_callback)
-        except Exception as e:
-            messagebox.showerror("Embeddings", f"Failed to build embeddings: {e}")
-            return
         progress = _ModalProgress(self.root, title="Building Embeddings", message="Preparing reference embeddings…")
         ok_holder = {"ok": True, "err": None}
         def _prebuild():
@@ -1907,12 +2033,17 @@ class ImageRangerGUI:
         if not ok_holder["ok"]:
             messagebox.showerror("Embeddings", f"Failed to build embeddings: {ok_holder['err']}")
             return
-        inbox = filedialog.askdirectory(title="Select Inbox Folder to Sort")
+        home = os.path.expanduser("~")
+        inbox = filedialog.askdirectory(title="Select Inbox Folder to Sort",
+                                        initialdir=self.settings.get("last_inbox_dir") or home)
         if not inbox:
             return
-        output = filedialog.askdirectory(title="Select Output Folder for Sorted Photos")
+        output = filedialog.askdirectory(title="Select Output Folder for Sorted Photos",
+                                         initialdir=self.settings.get("last_output_dir") or home)
         if not output:
             return
+        self.settings.set("last_inbox_dir", inbox)
+        self.settings.set("last_output_dir", output)
         unmatched = os.path.join(output, "_unmatched")
         match_mode = self.multi_face_mode.get()
         self.sort_stop_event = threading.Event()
@@ -1970,18 +2101,24 @@ class ImageRangerGUI:
         if not path:
             return
         try:
-            import csv, sqlite3
+            import sqlite3
             conn = sqlite3.connect(DB_PATH)
-            cur = conn.cursor()
-            cur.execute("""SELECT id, filename, matched_label, confidence, match_mode, timestamp
-                           FROM match_audit ORDER BY id""")
-            rows = cur.fetchall()
-            conn.close()
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                w.writerow(["id","filename","matched_label","confidence","match_mode","timestamp"])
-                w.writerows(rows)
-            messagebox.showinfo("Export", f"Exported {len(rows)} rows to:\n{path}")
+            count = 0
+            try:
+                conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache for the scan
+                cur = conn.cursor()
+                cur.arraysize = 1000
+                # ORDER BY id walks the primary key, so no sort step; stream in batches
+                cur.execute("""SELECT id, filename, matched_label, confidence, match_mode, timestamp
+                               FROM match_audit ORDER BY id""")
+                with open(path, "wb", buffering=1 << 20) as f:
+                    f.write(b"id,filename,matched_label,confidence,match_mode,timestamp\r\n")
+                    for batch in iter(cur.fetchmany, []):
+                        f.write("".join(map(file_ops.csv_line, batch)).encode("utf-8"))
+                        count += len(batch)
+            finally:
+                conn.close()
+            messagebox.showinfo("Export", f"Exported {count} rows to:\n{path}")
             self.gui_log(f"📤 Exported match audit to {path}")
         except Exception as e:
             messagebox.showerror("Export", f"Failed to export: {e}")
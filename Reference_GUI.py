@@ -387,7 +387,7 @@ class ReferenceBrowser(ttk.Frame):
             frame.configure(style="RefSelected.TFrame")
 
     def clear_selection(self):
-        for p in list(self.selected_paths):
+        for p in self.selected_paths:
             f = self.thumb_widgets.get(p)
             if f:
                 f.configure(style="TFrame")
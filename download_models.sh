@@ -15,3 +15,136 @@ gdown --id 1gWLXugVbjXSE57QsVCpBmN_tyJpXlsAc -O 1k3d68.onnx
 gdown --id 1XrOeD77P53jFE36Qd41iPECidfcYhWqw -O 2d106det.onnx
 
 echo "✅ All files downloaded successfully."
+
+echo "⚙️ Quantizing the recognition model to INT8 (used on CPU-only machines)..."
+python - <<'PY' && echo "✅ INT8 recognition model written." || echo "⚠️ INT8 quantization skipped; the FP32 model will be used."
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import onnxruntime as ort
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+NAME = "w600k_r50.onnx"
+
+
+def session(path):
+    return ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+
+
+def unit(a):
+    return a / np.linalg.norm(a, axis=1, keepdims=True)
+
+
+def median_run_s(sess, feed, runs=5):
+    sess.run(None, feed)  # warm-up
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        sess.run(None, feed)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times))
+
+
+tmp = tempfile.mkdtemp(prefix="int8-", dir=".")
+try:
+    out = os.path.join(tmp, NAME)
+    quantize_dynamic(NAME, out, weight_type=QuantType.QInt8)
+
+    fp32, int8 = session(NAME), session(out)
+    feed = {fp32.get_inputs()[0].name: np.random.default_rng(0).uniform(-1, 1, (8, 3, 112, 112)).astype(np.float32)}
+
+    # INT8 embeddings share the FP32 per-label thresholds, so they must agree
+    a, b = unit(fp32.run(None, feed)[0]), unit(int8.run(None, feed)[0])
+    drift = float(np.max(1.0 - np.sum(a * b, axis=1)))
+    print(f"   recognition cosine drift INT8 vs FP32: {drift:.2e}")
+    if drift > 1e-3:
+        raise SystemExit("INT8 recognition drifts too far from FP32")
+
+    # dynamic quantization turns convs into ConvInteger, which isn't faster on every CPU
+    t32, t8 = median_run_s(fp32, feed), median_run_s(int8, feed)
+    print(f"   batch of 8: FP32 {t32 * 1000:.0f} ms, INT8 {t8 * 1000:.0f} ms")
+    if t8 >= 0.9 * t32:
+        raise SystemExit("INT8 recognition is not faster than FP32 on this CPU")
+
+    os.makedirs("int8", exist_ok=True)
+    os.replace(out, os.path.join("int8", NAME))
+except BaseException:
+    # a copy from an earlier run would still be loaded on CPU
+    try:
+        os.remove(os.path.join("int8", NAME))
+    except OSError:
+        pass
+    raise
+finally:
+    shutil.rmtree(tmp, ignore_errors=True)
+PY
+
+echo "⚙️ Converting detection + recognition models to FP16 (used on CUDA)..."
+python - <<'PY' && echo "✅ FP16 models written." || echo "⚠️ FP16 conversion skipped; the FP32 models will be used."
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import onnx
+import onnxruntime as ort
+from onnxconverter_common import float16
+
+MODELS = ("det_10g.onnx", "w600k_r50.onnx")
+
+# photo-sorter only loads the FP16 copies on CUDA, so validate them there;
+# without CUDA there is nothing to validate against (and CPU EPs often lack fp16 kernels)
+if "CUDAExecutionProvider" not in ort.get_available_providers():
+    raise SystemExit("no CUDA execution provider on this machine")
+
+
+def run(path, x):
+    sess = ort.InferenceSession(path, providers=["CUDAExecutionProvider"])
+    return sess.run(None, {sess.get_inputs()[0].name: x})
+
+
+def unit(a):
+    return a / np.linalg.norm(a, axis=1, keepdims=True)
+
+
+rng = np.random.default_rng(0)
+tmp = tempfile.mkdtemp(prefix="fp16-", dir=".")
+try:
+    for name in MODELS:
+        model = float16.convert_float_to_float16(onnx.load(name), keep_io_types=True)
+        onnx.save(model, os.path.join(tmp, name))
+
+    # recognition: FP16 embeddings must stay interchangeable with FP32 ones (same thresholds)
+    x = rng.uniform(-1, 1, (8, 3, 112, 112)).astype(np.float32)
+    a = unit(run("w600k_r50.onnx", x)[0])
+    b = unit(run(os.path.join(tmp, "w600k_r50.onnx"), x)[0])
+    drift = float(np.max(1.0 - np.sum(a * b, axis=1)))
+    print(f"   recognition cosine drift FP16 vs FP32: {drift:.2e}")
+    if drift > 1e-3:
+        raise SystemExit("FP16 recognition drifts too far from FP32")
+
+    # detection: every output (scores, boxes, landmarks) within 1% of its FP32 range
+    x = rng.uniform(-1, 1, (1, 3, 640, 640)).astype(np.float32)
+    for ref, out in zip(run("det_10g.onnx", x), run(os.path.join(tmp, "det_10g.onnx"), x)):
+        err = float(np.max(np.abs(ref - out)))
+        if err > 1e-2 * max(1.0, float(np.max(np.abs(ref)))):
+            raise SystemExit(f"FP16 detection output drifts too far from FP32 ({err:.2e})")
+    print("   detection outputs match FP32")
+
+    os.makedirs("fp16", exist_ok=True)
+    for name in MODELS:
+        os.replace(os.path.join(tmp, name), os.path.join("fp16", name))
+except BaseException:
+    # don't leave copies from an earlier run behind: photo-sorter would load them
+    for name in MODELS:
+        try:
+            os.remove(os.path.join("fp16", name))
+        except OSError:
+            pass
+    raise
+finally:
+    shutil.rmtree(tmp, ignore_errors=True)
+PY
@@ -24,15 +24,27 @@ import threading
 import tkinter as tk
 import sys, subprocess
 from tkinter import ttk, filedialog, messagebox, simpledialog, colorchooser
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import tkinter.font as tkfont
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import queue
 import itertools
 import gc
+import sqlite3
+import functools
+import hashlib
+import bisect
+import weakref
 from types import SimpleNamespace
 
-from PIL import Image, ImageTk
+import numpy as np
+from PIL import Image, ImageTk, ImageDraw
 from collections import OrderedDict
 
+from thumb_decode import decode_one, prefetch, resample_for
+import thumb_disk_cache
+import file_ops
+
 from reference_db import (
     init_db,
     insert_reference,
@@ -55,6 +67,8 @@ SETTINGS_DEFAULT = {
     "ref_grid_sel_border": 6,
     "default_mode":        "best",   # best | multi | manual
     "reference_root":      os.path.join(os.getcwd(), "references"),   # ⬅️ NEW
+    "last_inbox_dir":      "",       # start_sort_flow pickers reopen here
+    "last_output_dir":     "",
 }
 
 #---------------UndoStack ----------------------------
@@ -116,6 +130,11 @@ def _module_trash_root() -> Path:
     return t
 
 
+# _unique_path + move must be atomic when trash moves run on worker threads
+_TRASH_LOCK = threading.Lock()
+_TRASH_MAX_WORKERS = 8  # more than this just thrashes the Windows Shell API
+
+
 def _trash_move_file(file_path: str) -> tuple[bool, str | None]:
     """
     Try to delete (prefer sending to OS recycle bin). Return (ok, detail).
@@ -129,9 +148,10 @@ def _trash_move_file(file_path: str) -> tuple[bool, str | None]:
             send2trash(str(p))
             return True, "recycle"
         # Fallback: move into app-local .trash
-        trash_root = _module_trash_root()
-        dest = _unique_path(trash_root, p.name)
-        shutil.move(str(p), str(dest))
+        with _TRASH_LOCK:
+            trash_root = _module_trash_root()
+            dest = _unique_path(trash_root, p.name)
+            shutil.move(str(p), str(dest))
         return True, str(dest)
     except Exception as e:
         return False, f"error: {e!s}"
@@ -167,10 +187,17 @@ def load_settings():
     except Exception:
         return dict(SETTINGS_DEFAULT)
 
+_SETTINGS_WRITE_LOCK = threading.Lock()
+
 def save_settings(settings: dict):
+    """Write app_settings.json atomically (tmp file + os.replace)."""
+    path = _settings_path()
+    tmp = path + ".tmp"
     try:
-        with open(_settings_path(), "w", encoding="utf-8") as f:
-            json.dump(settings, f, indent=2)
+        with _SETTINGS_WRITE_LOCK:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(settings, f, indent=2)
+            os.replace(tmp, path)
         return True
     except Exception:
         return False
@@ -185,68 +212,286 @@ except Exception:  # pragma: no cover
     def purge_missing_references() -> int:
         return 0
 
-from photo_sorter import (
-    build_reference_embeddings_from_db,
-    sort_photos_with_embeddings_from_folder_using_db
-)
+# Bulk helpers: one transaction (one fsync) for N rows instead of N commits.
+# The schema is owned by reference_db: without its bulk API, fall back to the
+# per-row calls and skip (log) a row that fails rather than abort the batch.
+try:
+    from reference_db import delete_references_bulk
+except Exception:  # pragma: no cover
+    def delete_references_bulk(paths) -> int:
+        deleted = 0
+        for path in paths:
+            try:
+                delete_reference(path)
+                deleted += 1
+            except Exception as e:
+                print(f"⚠️ Could not delete reference {path}: {e}")
+        return deleted
+
+try:
+    from reference_db import insert_references_bulk
+except Exception:  # pragma: no cover
+    def insert_references_bulk(pairs) -> int:
+        added = 0
+        for path, label in pairs:
+            try:
+                insert_reference(path, label)
+                added += 1
+            except Exception as e:
+                print(f"⚠️ Could not insert reference {path}: {e}")
+        return added
+
+try:
+    from reference_db import update_references_bulk
+except Exception:  # pragma: no cover
+    def update_references_bulk(rows) -> int:
+        """rows: [(old_path, new_path, new_label), ...]"""
+        moved = 0
+        for old_path, new_path, new_label in rows:
+            try:
+                delete_reference(old_path)
+                insert_reference(new_path, new_label)
+                moved += 1
+            except Exception as e:
+                print(f"⚠️ Could not move reference {old_path}: {e}")
+        return moved
+
+try:
+    from reference_db import get_distinct_labels
+except Exception:  # pragma: no cover
+    def get_distinct_labels() -> list[str]:
+        return sorted({lbl for (_id, lbl, _path) in get_all_references()})
+
+# ---- Read-through cache for hot DB reads ---------------------
+# One user action (rename, delete, reload…) used to re-query SQLite several
+# times. Reads go through these; every mutating call below clears them.
+
+@functools.lru_cache(maxsize=1)
+def _cached_all_refs():
+    return tuple(get_all_references())  # [(id, label, path), ...]
+
+@functools.lru_cache(maxsize=256)
+def _cached_threshold(label):
+    return get_threshold_for_label(label)
+
+@functools.lru_cache(maxsize=1)
+def _cached_refs_by_label():
+    """{label: (path, ...)} bucketed once from _cached_all_refs()."""
+    d = {}
+    for _id, label, path in _cached_all_refs():
+        d.setdefault(label, []).append(path)
+    return {k: tuple(v) for k, v in d.items()}
+
+@functools.lru_cache(maxsize=1)
+def _cached_label_names():
+    return tuple(get_all_labels())
+
+_LABEL_FOLDERS = {}  # label -> resolved folder; see get_label_folder_path()
+
+def _has_references() -> bool:
+    """True if at least one reference row exists (no full table read)."""
+    try:
+        conn = _connect_db()
+        try:
+            return conn.execute("SELECT 1 FROM reference_entries LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+    except Exception:
+        return bool(_cached_all_refs())
+
+_REF_MUTATION_VERSION = 0  # bumped on every write; cheap staleness check
+
+def _invalidate_reference_caches():
+    global _REF_MUTATION_VERSION
+    _REF_MUTATION_VERSION += 1
+    _cached_all_refs.cache_clear()
+    _cached_threshold.cache_clear()
+    _cached_label_names.cache_clear()
+    _cached_refs_by_label.cache_clear()
+    _LABEL_FOLDERS.clear()
+
+def _invalidates_caches(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _invalidate_reference_caches()
+    return wrapper
+
+insert_reference = _invalidates_caches(insert_reference)
+delete_reference = _invalidates_caches(delete_reference)
+set_threshold_for_label = _invalidates_caches(set_threshold_for_label)
+delete_label = _invalidates_caches(delete_label)
+insert_or_update_label = _invalidates_caches(insert_or_update_label)
+purge_missing_references = _invalidates_caches(purge_missing_references)
+delete_references_bulk = _invalidates_caches(delete_references_bulk)
+insert_references_bulk = _invalidates_caches(insert_references_bulk)
+update_references_bulk = _invalidates_caches(update_references_bulk)
 
 # ---- Constants ----------------------------------------------
 
 THUMBNAIL_SIZE = (100, 100)
 DB_PATH = "reference_data.db"
 
+# Zoom snaps to these so a slider drag reuses a handful of cache keys per photo
+# instead of minting a new one for every pixel of travel.
+CANONICAL_THUMB_SIZES = (64, 96, 128, 160, 192, 224, 256, 320, 384, 480, 640)
+
+def _snap_thumb_size(value: int, lo: int, hi: int) -> int:
+    """Nearest canonical size within [lo, hi]; falls back to clamping if none fits."""
+    sizes = [s for s in CANONICAL_THUMB_SIZES if lo <= s <= hi]
+    if not sizes:
+        return max(lo, min(hi, int(value)))
+    i = bisect.bisect_left(sizes, value)
+    near = sizes[max(0, i - 1):i + 1]
+    return min(near, key=lambda s: abs(s - value))
+
+# Write-heavy flows (delete/rename) commit many rows; WAL + NORMAL sync avoids
+# an fsync per transaction. journal_mode is stored in the DB file (it adds a
+# reference_data.db-wal sidecar); the others are per connection.
+_DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+)
+
+def _connect_db(path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    for pragma in _DB_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
 # ---- Utilities -----------------------------------------------
 
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
+_IMAGE_EXTS = frozenset((".jpg", ".jpeg", ".png", ".bmp", ".webp"))
+
+def _iter_image_files(folder: str, exts=_IMAGE_EXTS):
+    """
+    Lazily yield image paths under folder (recursive) using os.scandir.
+    DirEntry already carries name/type, so no extra stat per file.
+    """
+    exts = exts if isinstance(exts, frozenset) else frozenset(e.lower() for e in exts)
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                subdirs = []
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                            continue
+                        name = entry.name
+                        dot = name.rfind(".")
+                        # one slice + set probe instead of endswith over a tuple
+                        if dot > 0 and name[dot:].lower() in exts and entry.is_file():
+                            yield entry.path
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        # keep os.walk-like order (first subdir visited first)
+        stack.extend(reversed(subdirs))
+
 #-----------------------------
 # --- Global thumbnail cache (LRU) ---
-_THUMB_CACHE = {}
-_THUMB_CACHE_ORDER = []
+_THUMB_CACHE = OrderedDict()  # LRU: oldest first, move_to_end on hit
 _THUMB_CACHE_MAX = 400  # adjust to your RAM; ~400 * small images
+_THUMB_CACHE_LOCK = threading.Lock()  # get() runs on the thumb producer thread
+
+def _jpeg_draft(im, size):
+    """Let libjpeg decode at 1/2..1/8 scale (still >= 2x the target) before thumbnail()."""
+    if im.format == "JPEG":
+        im.draft("RGB", (size[0] * 2, size[1] * 2))
+
+def _fingerprint(path):
+    """
+    Cheap content key so duplicate files share one thumb: size + mtime + hash of
+    the first 64KB. The mtime keeps same-size files with identical headers
+    (uncompressed BMP/TIFF, burst shots) apart; copy2 preserves it, so label
+    copies still match their source.
+    """
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        head = f.read(65536)
+    return (st.st_size, st.st_mtime_ns, hashlib.blake2b(head, digest_size=8).digest())
 
 def _thumbcache_get(key):
-    if key in _THUMB_CACHE:
-        # refresh order (move to end)
-        if key in _THUMB_CACHE_ORDER:
-            _THUMB_CACHE_ORDER.remove(key)
-        _THUMB_CACHE_ORDER.append(key)
-        return _THUMB_CACHE[key]
+    with _THUMB_CACHE_LOCK:
+        if key in _THUMB_CACHE:
+            _THUMB_CACHE.move_to_end(key)
+            return _THUMB_CACHE[key]
     return None
 
 def _thumbcache_put(key, value):
-    _THUMB_CACHE[key] = value
-    _THUMB_CACHE_ORDER.append(key)
-    while len(_THUMB_CACHE_ORDER) > _THUMB_CACHE_MAX:
-        old = _THUMB_CACHE_ORDER.pop(0)
-        try:
-            del _THUMB_CACHE[old]
-        except Exception:
-            pass
+    with _THUMB_CACHE_LOCK:
+        _THUMB_CACHE[key] = value
+        _THUMB_CACHE.move_to_end(key)
+        while len(_THUMB_CACHE) > _THUMB_CACHE_MAX:
+            _THUMB_CACHE.popitem(last=False)
+
+# Downscale ladder: the largest decoded RGB thumb per image (PIL, not Tk), so
+# zooming out resamples a cached thumb instead of decoding the original again.
+_THUMB_LADDER = OrderedDict()  # content key -> PIL.Image
+_THUMB_LADDER_MAX = 256
+
+def _ladder_get(ident, size):
+    """A PIL thumb of `ident` resized to fit size=(w, h), or None if no big-enough source is cached."""
+    with _THUMB_CACHE_LOCK:
+        src = _THUMB_LADDER.get(ident)
+        if src is None or (src.width < size[0] and src.height < size[1]):
+            return None
+        _THUMB_LADDER.move_to_end(ident)
+    im = src.copy()
+    im.thumbnail(size, resample_for(size))
+    return im
+
+def _ladder_put(ident, im):
+    with _THUMB_CACHE_LOCK:
+        old = _THUMB_LADDER.get(ident)
+        if old is None or im.width * im.height > old.width * old.height:
+            _THUMB_LADDER[ident] = im
+        _THUMB_LADDER.move_to_end(ident)
+        while len(_THUMB_LADDER) > _THUMB_LADDER_MAX:
+            _THUMB_LADDER.popitem(last=False)
 
 #-----------------------------
 
-def unique_copy_or_move(src: str, dst_folder: str, keep_original=False) -> str:
-    """Copy (or move) file to dst_folder with a short unique prefix; returns destination path."""
-    ensure_dir(dst_folder)
+def unique_copy_or_move(src: str, dst_folder: str, keep_original=False, ensure=True) -> str:
+    """Copy (or move) file to dst_folder with a short unique prefix; returns destination path.
+    Pass ensure=False when the caller already created dst_folder."""
+    if ensure:
+        ensure_dir(dst_folder)
     base = os.path.basename(src)
     unique = f"{uuid.uuid4().hex[:8]}_{base}"
     dst = os.path.join(dst_folder, unique)
     if keep_original:
-        shutil.copy2(src, dst)
+        file_ops.fast_copy(src, dst)
     else:
-        shutil.move(src, dst)
+        shutil.move(src, dst, copy_function=file_ops.fast_copy)  # rename when same device
     return dst
 
+_LABELS_CACHE = (-1, [])  # (mutation version, labels)
+
 def _labels_from_entries() -> list[str]:
     """Return sorted unique labels present in reference_entries table."""
+    global _LABELS_CACHE
+    version, labels = _LABELS_CACHE
+    if version == _REF_MUTATION_VERSION:
+        return list(labels)
+    version = _REF_MUTATION_VERSION
     try:
-        rows = get_all_references()  # [(id, label, path), ...]
-        labels = sorted({lbl for (_id, lbl, _path) in rows})
-        return labels
+        labels = get_distinct_labels()
     except Exception:
         return []
+    _LABELS_CACHE = (version, labels)
+    return list(labels)
         
 def get_reference_root():
     # prefer user setting; else default to ./References under the current app folder
@@ -280,58 +525,51 @@ def get_reference_root():
     
 
 def get_label_folder_path(label: str) -> str:
+    folder = _LABEL_FOLDERS.get(label)
+    if folder and os.path.isdir(folder):
+        return folder
     folder = os.path.join(get_reference_root(), label)
     os.makedirs(folder, exist_ok=True)
+    _LABEL_FOLDERS[label] = folder
     return folder
 
-def _safe_copy_to_label_folder(src_path: str, label: str, keep_original_name: bool = True) -> str:
-    """
-    Copy src_path into ReferenceRoot/<label>/ collision-safely; return destination path.
-    """
-    folder = get_label_folder_path(label)
-    base = os.path.basename(src_path)
-    if keep_original_name:
-        name, ext = os.path.splitext(base)
-        candidate = os.path.join(folder, base)
-        if not os.path.exists(candidate):
-            shutil.copy2(src_path, candidate)
-            return candidate
-        i = 2
-        while True:
-            candidate = os.path.join(folder, f"{name}_{i}{ext}")
-            if not os.path.exists(candidate):
-                shutil.copy2(src_path, candidate)
-                return candidate
-            i += 1
-    else:
-        dst = os.path.join(folder, f"{uuid.uuid4().hex[:8]}_{base}")
-        shutil.copy2(src_path, dst)
-        return dst
+def _copy_to_label_folder_many(paths, label: str) -> tuple[list[str], list[tuple[str, Exception]]]:
+    """Copy `paths` into ReferenceRoot/<label>/ collision-safely; returns (copied, failed)."""
+    return file_ops.copy_many_into(paths, get_label_folder_path(label))
+
+_META_SIG = {}  # label -> hash((files, thr)) of the last metadata.json we wrote
 
 def _write_or_refresh_metadata(label: str, threshold: float | None = None):
     """
     Create/refresh metadata.json in ReferenceRoot/<label>/ with:
       { "label": <label>, "threshold": <threshold or stored>, "files": [ ... ] }
+    Skips the write when nothing changed since the last call; writes atomically.
     """
     folder = get_label_folder_path(label)
     meta_path = os.path.join(folder, "metadata.json")
 
-    # List current image files
-    files = sorted([
-        f for f in os.listdir(folder)
-        if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp"))
-    ])
+    # List current image files (single scandir pass, filtered inline)
+    exts = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+    with os.scandir(folder) as it:
+        files = sorted(e.name for e in it if e.name.lower().endswith(exts) and e.is_file())
 
     # If threshold is not provided, try DB; else 0.3 default.
     try:
-        thr = threshold if threshold is not None else get_threshold_for_label(label)
+        thr = threshold if threshold is not None else _cached_threshold(label)
     except Exception:
         thr = 0.3
 
+    sig = hash((tuple(files), thr))
+    if _META_SIG.get(label) == sig and os.path.exists(meta_path):
+        return
+
     data = {"label": label, "threshold": thr, "files": files}
+    tmp_path = meta_path + ".tmp"
     try:
-        with open(meta_path, "w", encoding="utf-8") as f:
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=2)
+        os.replace(tmp_path, meta_path)
+        _META_SIG[label] = sig
     except Exception:
         pass  # non-fatal
 
@@ -349,10 +587,32 @@ class BottomLogFrame(tk.Frame):
         self.text.configure(yscrollcommand=self.scroll.set)
         self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        # log() may be called from worker threads; lines are queued and drained
+        # on the Tk thread in one insert per tick instead of one per message.
+        self._pending = queue.Queue()
+        self.after(self.DRAIN_MS, self._drain)
+
+    MAX_LINES = 5000   # keep the Text widget small; inserts slow down as it grows
+    DRAIN_MS = 100
 
     def log(self, msg):
+        self._pending.put(msg)  # thread-safe; never touches Tk
+
+    def _drain(self):
+        self.after(self.DRAIN_MS, self._drain)
+        lines = []
         try:
-            self.text.insert(tk.END, msg + "\n")
+            while True:
+                lines.append(str(self._pending.get_nowait()))
+        except queue.Empty:
+            pass
+        if not lines:
+            return
+        try:
+            self.text.insert(tk.END, "\n".join(lines) + "\n")
+            extra = int(self.text.index("end-1c").split(".")[0]) - self.MAX_LINES
+            if extra > 0:
+                self.text.delete("1.0", f"{extra + 1}.0")
             self.text.see(tk.END)
         except Exception:
             self.text.insert(tk.END, "[log error]\n")
@@ -399,9 +659,61 @@ def _bind_horizontal_mousewheel(canvas: tk.Canvas):
     canvas.bind("<Button-4>", _on_mousewheel)
     canvas.bind("<Button-5>", _on_mousewheel)
 
+def _paths_for_label(entries, label: str) -> list[str]:
+    """Paths of (id, label, path) rows whose label matches (one O(N) pass)."""
+    return [path for (_id, lbl, path) in entries if lbl == label]
+
+def _can_rename_label_folder(old_folder: str, new_folder: str) -> bool:
+    """True when a label rename can be a single directory rename (same parent, no merge)."""
+    same_parent = (os.path.normcase(os.path.dirname(os.path.abspath(old_folder)))
+                   == os.path.normcase(os.path.dirname(os.path.abspath(new_folder))))
+    if not same_parent or not os.path.isdir(old_folder):
+        return False
+    if not os.path.exists(new_folder):
+        return True
+    try:
+        return os.path.samefile(old_folder, new_folder)  # case-only rename on a case-insensitive FS
+    except OSError:
+        return False
+
+def _center_window(win, size, over=None):
+    """
+    Place `win` centred over `over` (or the screen) using a fixed size estimate.
+    Avoids update_idletasks(), which would flush every pending redraw first.
+    """
+    ww, wh = size
+    try:
+        if over is not None and over.winfo_ismapped():
+            x = over.winfo_rootx() + over.winfo_width() // 2
+            y = over.winfo_rooty() + over.winfo_height() // 2
+        else:
+            x, y = win.winfo_screenwidth() // 2, win.winfo_screenheight() // 2
+        win.geometry(f"+{max(0, x - ww // 2)}+{max(0, y - wh // 2)}")
+    except Exception:
+        pass
+
+# ---- Review grid geometry ------------------------------------
+
+_REVIEW_COLS = 6
+_REVIEW_CELL_W = 172  # thumb + filename + combobox, incl. 6px margin each side
+_REVIEW_CELL_H = 176
+
+# ---- Reference strip geometry --------------------------------
+
+_REF_SLOT_W = THUMBNAIL_SIZE[0] + 12  # thumb + border + pad, per strip slot
+_REF_BUFFER = 8  # slots materialized beyond each edge of the viewport
+
 # ---- DB init -----------------------------------------------
+# Run from the __main__ block, not at import: on spawn platforms the decode
+# pool's workers re-execute this script as __mp_main__, and they only need
+# thumb_decode — not the DB, nor photo_sorter's insightface/onnxruntime.
 
-init_db()
+def _init_database():
+    init_db()
+    try:
+        _connect_db().close()  # switch the DB file to WAL once
+    except Exception as e:
+        print(f"⚠️ Could not apply SQLite pragmas: {e}")
 
 # ---- Reference Browser (top strip) ---------------------------
 class ReferenceBrowser(ttk.Frame):
@@ -418,8 +730,28 @@ class ReferenceBrowser(ttk.Frame):
         self.undo_push = undo_push  # callback provided by ImageRangerGUI.undo.push
 
         self.label_filter = tk.StringVar()
-        self.selected_paths = set()
-        self.thumb_widgets = {}
+        # parallel arrays indexed by thumb slot. Only slots near the viewport
+        # have widgets (frames[i]/_labels[i] are None otherwise).
+        self.paths = []
+        self.frames = []
+        self._labels = []
+        self._keys = []        # thumb-cache key per slot once decoded
+        self.selected = np.zeros(0, dtype=bool)
+        self._live = set()      # slots that currently have widgets
+        self._slot_photos = {}  # live slot -> (photo_normal, photo_selected)
+        self._requested = set() # slots queued for decode
+        self._viewport_pending = False
+        self._pumping = False
+
+        # decoder thread: slots enqueue (gen, slot, path); results come back
+        # as PIL images and become PhotoImages on the Tk thread.
+        self._load_gen = 0
+        self._thumb_q = queue.Queue()
+        self._done_q = queue.Queue()
+        self._refresh_after_id = None  # pending refresh() idle callback
+        self._refresh_select = None
+        self._refresh_reload = False
+        threading.Thread(target=self._decode_worker, daemon=True).start()
 
         # --- UI: scrollable horizontal strip of thumbs ---
         self.canvas = tk.Canvas(self, height=130)
@@ -427,13 +759,14 @@ class ReferenceBrowser(ttk.Frame):
         self.inner_frame = ttk.Frame(self.canvas)
 
         self.canvas.create_window((0, 0), window=self.inner_frame, anchor='nw')
-        self.canvas.configure(xscrollcommand=self.scroll_x.set)
+        self.canvas.configure(xscrollcommand=self._on_xscroll)
 
         self.canvas.pack(fill=tk.X, expand=True, side=tk.TOP)
         _bind_horizontal_mousewheel(self.canvas)
         self.scroll_x.pack(fill=tk.X, side=tk.BOTTOM)
 
         self.inner_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        self.canvas.bind("<Configure>", self._schedule_viewport)
         self.canvas.bind_all("<Shift-MouseWheel>", self._on_mousewheel)
 
         # --- controls ---
@@ -456,25 +789,197 @@ class ReferenceBrowser(ttk.Frame):
     def _on_mousewheel(self, event):
         self.canvas.xview_scroll(-1 * int(event.delta / 120), "units")
 
-    def _toggle_select(self, path):
-        frame = self.thumb_widgets.get(path)
-        if not frame:
+    def _toggle_select(self, i):
+        if not (0 <= i < len(self.paths)):
+            return
+        self.selected[i] = not self.selected[i]
+        self._restyle((i,))
+
+    def _restyle(self, indices):
+        # decoded slots swap between two pre-rendered images; placeholders
+        # (not decoded yet) fall back to the frame style
+        for i in indices:
+            pair = self._slot_photos.get(i)
+            if pair is not None:
+                self._labels[i].configure(image=pair[1] if self.selected[i] else pair[0])
+            elif self.frames[i] is not None:
+                self.frames[i].configure(style="RefSelected.TFrame" if self.selected[i] else "TFrame")
+
+    # ---------------- viewport (only visible slots get widgets) ----------------
+    def _on_xscroll(self, first, last):
+        self.scroll_x.set(first, last)
+        self._schedule_viewport()
+
+    def _schedule_viewport(self, *_):
+        if not self._viewport_pending:
+            self._viewport_pending = True
+            self.after_idle(self._update_viewport)
+
+    def _update_viewport(self):
+        self._viewport_pending = False
+        n = len(self.paths)
+        if not n:
             return
-        if path in self.selected_paths:
-            self.selected_paths.remove(path)
-            frame.configure(style="TFrame")
+        x0 = self.canvas.canvasx(0)
+        width = max(self.canvas.winfo_width(), 1)
+        first = max(0, int(x0 // _REF_SLOT_W) - _REF_BUFFER)
+        last = min(n - 1, int((x0 + width) // _REF_SLOT_W) + _REF_BUFFER)
+
+        # unload outside a wider window so small scrolls back and forth don't thrash
+        lo, hi = first - 2 * _REF_BUFFER, last + 2 * _REF_BUFFER
+        for i in [i for i in self._live if i < lo or i > hi]:
+            self._unload_slot(i)
+        for i in range(first, last + 1):
+            if i not in self._live:
+                self._materialize_slot(i)
+
+    def _materialize_slot(self, i):
+        frame = ttk.Frame(self.inner_frame, borderwidth=2, relief="solid",
+                          style="RefSelected.TFrame" if self.selected[i] else "TFrame")
+        frame.place(x=i * _REF_SLOT_W + 2, y=2, width=_REF_SLOT_W - 4, height=THUMBNAIL_SIZE[1] + 8)
+
+        label_widget = ttk.Label(frame, text="…", anchor="center")
+        label_widget.pack(expand=True, fill=tk.BOTH)
+        label_widget.bind("<Button-1>", lambda e, i=i: self._toggle_select(i))
+
+        self.frames[i] = frame
+        self._labels[i] = label_widget
+        self._live.add(i)
+
+        pair = _thumbcache_get(self._keys[i]) if self._keys[i] is not None else None
+        if pair is not None:
+            self._show_photo(i, pair)
+        elif i not in self._requested:
+            self._requested.add(i)
+            self._thumb_q.put((self._load_gen, i, self.paths[i]))
+            self._start_pump()
+
+    def _unload_slot(self, i):
+        f = self.frames[i]
+        if f is not None:
+            f.destroy()
+        self.frames[i] = None
+        self._labels[i] = None
+        self._live.discard(i)
+        self._slot_photos.pop(i, None)
+
+    def _show_photo(self, i, pair):
+        self._slot_photos[i] = pair
+        self.frames[i].configure(style="TFrame")
+        lbl = self._labels[i]
+        lbl.configure(image=pair[1] if self.selected[i] else pair[0], text="")
+        lbl.image = pair
+
+    # ---------------- decode worker + Tk-side pump ----------------
+    def _decode_worker(self):
+        while True:
+            gen, i, path = self._thumb_q.get()
+            if gen != self._load_gen:
+                continue  # stale request from a previous reload
+            color = SETTINGS["ref_grid_sel_color"]
+            border = int(SETTINGS["ref_grid_sel_border"])
+            try:
+                # the strip caches (normal, selected) pairs, so its keys are
+                # kept apart from the main grid's single-image entries
+                key = ("ref", _fingerprint(path), color, border)
+            except OSError:
+                self._done_q.put((gen, i, "missing", None))
+                continue
+            cached = _thumbcache_get(key)
+            if cached is not None:
+                self._done_q.put((gen, i, "ok", (cached, key)))
+                continue
+            try:
+                with Image.open(path) as im:
+                    _jpeg_draft(im, THUMBNAIL_SIZE)
+                    im = im.convert("RGB")
+                    im.thumbnail(THUMBNAIL_SIZE, resample_for(THUMBNAIL_SIZE))
+                sel = im.copy()
+                ImageDraw.Draw(sel).rectangle(
+                    [0, 0, sel.width - 1, sel.height - 1], outline=color, width=border
+                )
+                self._done_q.put((gen, i, "img", (im, sel, key)))  # same process: hand over the objects
+            except Exception as e:
+                self._done_q.put((gen, i, "err", str(e)))
+
+    def _start_pump(self):
+        if not self._pumping:
+            self._pumping = True
+            self.after(30, self._drain_thumb_queue)
+
+    def _drain_thumb_queue(self):
+        gen = self._load_gen
+        BATCH = 24
+        for _ in range(BATCH):
+            try:
+                rgen, i, kind, payload = self._done_q.get_nowait()
+            except queue.Empty:
+                break
+            if rgen != gen:
+                continue
+            self._requested.discard(i)
+            pair = None
+            if kind == "ok":
+                pair, self._keys[i] = payload
+            elif kind == "img":
+                im, sel, key = payload
+                try:
+                    pair = (ImageTk.PhotoImage(im), ImageTk.PhotoImage(sel))
+                    _thumbcache_put(key, pair)
+                    self._keys[i] = key
+                except Exception as e:
+                    self.gui_log(f"[Thumbnail error] {self.paths[i]}: {e}")
+            elif kind == "err":
+                self.gui_log(f"[Thumbnail error] {self.paths[i]}: {payload}")
+
+            if self._labels[i] is not None:
+                if pair is not None:
+                    self._show_photo(i, pair)
+                else:
+                    self._labels[i].configure(text="⚠️")
+        if self._requested:
+            self.after(30, self._drain_thumb_queue)
         else:
-            self.selected_paths.add(path)
-            frame.configure(style="RefSelected.TFrame")
+            self._pumping = False
+
+    def selected_path_list(self):
+        return [self.paths[i] for i in np.flatnonzero(self.selected)]
 
     def clear_selection(self):
-        for p in list(self.selected_paths):
-            f = self.thumb_widgets.get(p)
-            if f:
-                f.configure(style="TFrame")
-        self.selected_paths.clear()
+        was = np.flatnonzero(self.selected)
+        self.selected[:] = False
+        self._restyle(was)
+
+    def select_all(self):
+        self.selected[:] = True
+        self._restyle(self._live)
+
+    def invert_selection(self):
+        self.selected ^= True
+        self._restyle(self._live)
 
     # ---------------- data/UI refresh ----------------
+    def refresh(self, label=None, reload_images=False):
+        """
+        Label list refresh (+ optional select/reload) in one idle pass;
+        calls made before the UI goes idle merge into a single redraw.
+        """
+        if label:
+            self._refresh_select = label
+        self._refresh_reload = self._refresh_reload or reload_images
+        if self._refresh_after_id is None:
+            self._refresh_after_id = self.after_idle(self._flush_refresh)
+
+    def _flush_refresh(self):
+        self._refresh_after_id = None
+        label, self._refresh_select = self._refresh_select, None
+        reload, self._refresh_reload = self._refresh_reload, False
+        self.refresh_label_list(auto_select=False)
+        if label:
+            self.label_filter.set(label)
+        if reload:
+            self.load_images()
+
     def refresh_label_list(self, auto_select=True):
         labels = _labels_from_entries()
         self.label_menu.configure(values=labels)
@@ -485,46 +990,49 @@ class ReferenceBrowser(ttk.Frame):
                 self.load_images()
 
     def load_images(self):
+        # new generation: the worker and pump drop anything from older reloads
+        self._load_gen += 1
         for w in self.inner_frame.winfo_children():
             w.destroy()
-        self.thumb_widgets.clear()
-        self.clear_selection()
+        self.paths = []
+        self.frames = []
+        self._labels = []
+        self._keys = []
+        self._live = set()
+        self._slot_photos = {}
+        self._requested = set()
+        self.selected = np.zeros(0, dtype=bool)
 
         label = self.label_filter.get()
         if not label:
             self.gui_log("⚠️ No label selected in Reference Browser.")
             return
 
-        entries = get_all_references()
-        filtered = [e for e in entries if e[1] == label]
-
-        shown = 0
-        self._thumbs_internal_refs = []
-        for idx, (_id, lbl, path) in enumerate(filtered):
-            if not os.path.exists(path):
-                continue
-            try:
-                with Image.open(path) as im:
-                    im = im.convert("RGB")
-                    im.thumbnail(THUMBNAIL_SIZE)
-                    thumb = ImageTk.PhotoImage(im)
-                self._thumbs_internal_refs.append(thumb)
-
-                frame = ttk.Frame(self.inner_frame, borderwidth=2, relief="solid", style="TFrame")
-                frame.grid(row=0, column=idx, padx=2, pady=2)
-
-                label_widget = ttk.Label(frame, image=thumb)
-                label_widget.image = thumb
-                label_widget.pack()
-                label_widget.bind("<Button-1>", lambda e, p=path: self._toggle_select(p))
-
-                self.thumb_widgets[path] = frame
-                shown += 1
-            except Exception as e:
-                self.gui_log(f"[Thumbnail error] {path}: {e}")
-
-        if shown == 0:
+        entries = _cached_all_refs()
+        # one scandir of the label folder instead of a stat per row; rows stored
+        # elsewhere still fall back to os.path.exists
+        folder = get_label_folder_path(label)
+        try:
+            with os.scandir(folder) as it:
+                existing = {os.path.join(folder, e.name) for e in it if e.is_file()}
+        except OSError:
+            existing = set()
+        self.paths = [path for path in _paths_for_label(entries, label)
+                      if path in existing or os.path.exists(path)]
+        n = len(self.paths)
+        self.frames = [None] * n
+        self._labels = [None] * n
+        self._keys = [None] * n
+        self.selected = np.zeros(n, dtype=bool)
+
+        # fixed slot geometry: the strip is sized for all N, widgets only for the viewport
+        self.inner_frame.configure(width=max(1, n * _REF_SLOT_W + 4), height=THUMBNAIL_SIZE[1] + 12)
+        self.canvas.xview_moveto(0)
+
+        if not n:
             self.gui_log(f"⚠️ No existing references found for label '{label}'")
+            return
+        self._schedule_viewport()
 
     # ---------------- destructive actions with Undo ----------------
     def delete_selected_refs(self):
@@ -532,43 +1040,50 @@ class ReferenceBrowser(ttk.Frame):
         if not label:
             messagebox.showwarning("No Label", "Select a label first.")
             return
-        if not self.selected_paths:
+        targets = set(self.selected_path_list())
+        if not targets:
             messagebox.showwarning("No Selection", "Select reference photos to delete.")
             return
 
         confirm = messagebox.askyesno(
             "Delete Selected",
-            f"Delete {len(self.selected_paths)} reference photo(s) from label '{label}'?"
+            f"Delete {len(targets)} reference photo(s) from label '{label}'?"
         )
         if not confirm:
             return
 
-        entries = get_all_references()
-        targets = set(self.selected_paths)
+        entries = _cached_all_refs()
+        paths = [path for path in _paths_for_label(entries, label) if path in targets]
 
-        deleted = 0
-        undo_items = []  # each: {"trashed": path}
+        undo_items = []  # each: {"backup_path": ..., "original_path": ...}
+        to_drop = []
 
-        for (_id, lbl, path) in entries:
-            if lbl == label and path in targets:
-                try:
-                    # 1) move file to trash for safe undo
-                    restore_hint = None
-                    if os.path.isfile(path):
-                        ok, detail = _trash_move_file(path)   # ← pass only the file path
-                        if ok and detail not in (None, "recycle"):
-                            restore_hint = detail  # path inside .trash fallback; can be used for undo
+        # 1) move files to trash for safe undo (I/O-bound → overlap on a small pool)
+        def _trash_one(path):
+            if os.path.isfile(path):
+                return _trash_move_file(path)   # ← pass only the file path
+            return True, None
 
-                    # 2) remove DB entry
-                    delete_reference(path)
-                    deleted += 1
+        if paths:
+            with ThreadPoolExecutor(max_workers=min(_TRASH_MAX_WORKERS, len(paths))) as pool:
+                futures = {pool.submit(_trash_one, p): p for p in paths}
+                for fut in as_completed(futures):
+                    path = futures[fut]
+                    try:
+                        ok, detail = fut.result()
+                        to_drop.append(path)
+                        # record undo info if we have a concrete backup path in .trash
+                        if ok and detail not in (None, "recycle"):
+                            undo_items.append({"backup_path": detail, "original_path": path})
+                    except Exception as e:
+                        self.gui_log(f"⚠️ Could not delete '{path}': {e}")
 
-                    # record undo info if we have a concrete backup path
-                    if restore_hint:
-                        undo_items.append({"backup_path": restore_hint, "original_path": path})
-                        
-                except Exception as e:
-                    self.gui_log(f"⚠️ Could not delete '{path}': {e}")
+        # 2) remove DB entries in a single transaction
+        deleted = 0
+        try:
+            deleted = delete_references_bulk(to_drop)
+        except Exception as e:
+            self.gui_log(f"⚠️ Could not drop DB rows: {e}")
 
         # metadata refresh (optional)
         try:
@@ -585,7 +1100,7 @@ class ReferenceBrowser(ttk.Frame):
 
         self.gui_log(f"🗑️ Deleted {deleted} reference(s) from '{label}'. Rebuilding embeddings…")
         self.load_images()
-        self.schedule_rebuild_embeddings(only_label=label)
+        self.rebuild_embeddings_async(only_label=label)
 
     def delete_label_all(self):
         label = self.label_filter.get()
@@ -613,21 +1128,17 @@ class ReferenceBrowser(ttk.Frame):
             self.gui_log(f"⚠️ Could not move label folder to trash: {e}")
 
 
-        # delete DB rows for that label
-        entries = get_all_references()
+        # delete DB rows for that label (one transaction)
         deleted = 0
-        for (_id, lbl, path) in entries:
-            if lbl == label:
-                try:
-                    delete_reference(path)
-                    deleted += 1
-                except Exception as e:
-                    self.gui_log(f"⚠️ Could not drop DB row {path}: {e}")
+        try:
+            deleted = delete_references_bulk(list(_cached_refs_by_label().get(label, ())))
+        except Exception as e:
+            self.gui_log(f"⚠️ Could not drop DB rows for '{label}': {e}")
 
         # stash threshold then remove label metadata
         thr = None
         try:
-            thr = get_threshold_for_label(label)
+            thr = _cached_threshold(label)
         except Exception:
             pass
         try:
@@ -644,11 +1155,11 @@ class ReferenceBrowser(ttk.Frame):
 
         self.gui_log(f"🗑️ Deleted label '{label}' ({deleted} item(s)). Rebuilding embeddings…")
 
-        self.label_menu.configure(values=get_all_labels())
+        self.label_menu.configure(values=list(_cached_label_names()))
         self.refresh_label_list(auto_select=False)
         self.label_filter.set("")
         self.load_images()
-        self.schedule_rebuild_embeddings(only_label=label)
+        self.rebuild_embeddings_async(only_label=label)
 
     # ---------------- rename ----------------
     def rename_label(self):
@@ -659,19 +1170,42 @@ class ReferenceBrowser(ttk.Frame):
         if not new_label or new_label == current:
             return
 
-        entries = get_all_references()
-        moved = 0
+        entries = _cached_all_refs()
+        updates = []  # (old_path, new_path, new_label)
 
         old_folder = get_label_folder_path(current)
-        new_folder = get_label_folder_path(new_label)
-        os.makedirs(new_folder, exist_ok=True)
-
-        for (_id, lbl, path) in entries:
-            if lbl == current:
+        # not get_label_folder_path(): that creates the folder, and an existing
+        # target rules out the single directory rename below
+        new_folder = os.path.join(get_reference_root(), new_label)
+        old_prefix = os.path.abspath(old_folder) + os.sep  # hoisted: constant per run
+        paths = _paths_for_label(entries, current)
+
+        folder_renamed = False
+        if _can_rename_label_folder(old_folder, new_folder):
+            # one directory rename instead of N file moves; the two-step hop
+            # makes case-only renames ("bob" -> "Bob") stick on NTFS/APFS
+            tmp_folder = f"{new_folder}.renaming-{uuid.uuid4().hex[:6]}"
+            try:
+                os.rename(old_folder, tmp_folder)
+                os.rename(tmp_folder, new_folder)
+                folder_renamed = True
+            except OSError as e:
+                if os.path.isdir(tmp_folder) and not os.path.exists(old_folder):
+                    os.rename(tmp_folder, old_folder)
+                self.gui_log(f"⚠️ Folder rename failed, moving files one by one: {e}")
+
+        if folder_renamed:
+            for path in paths:
+                ap = os.path.abspath(path)
+                new_path = os.path.join(new_folder, ap[len(old_prefix):]) if ap.startswith(old_prefix) else path
+                updates.append((path, new_path, new_label))
+        else:
+            os.makedirs(new_folder, exist_ok=True)
+            for path in paths:
                 new_path = path
                 try:
                     # move file if it lives inside the old folder
-                    if os.path.commonpath([os.path.abspath(path), os.path.abspath(old_folder)]) == os.path.abspath(old_folder):
+                    if os.path.abspath(path).startswith(old_prefix):
                         base = os.path.basename(path)
                         name, ext = os.path.splitext(base)
                         candidate = os.path.join(new_folder, base)
@@ -686,15 +1220,17 @@ class ReferenceBrowser(ttk.Frame):
                         new_path = candidate
                 except Exception:
                     pass
-                insert_reference(new_path, new_label)
-                moved += 1
+                updates.append((path, new_path, new_label))
+
+        # re-point all rows in one transaction
+        moved = update_references_bulk(updates)
 
-        thr = get_threshold_for_label(current)
+        thr = _cached_threshold(current)
         set_threshold_for_label(new_label, thr)
         insert_or_update_label(new_label, new_folder, thr)
 
         try:
-            if os.path.isdir(old_folder) and not os.listdir(old_folder):
+            if not folder_renamed and os.path.isdir(old_folder) and not os.listdir(old_folder):
                 shutil.rmtree(old_folder)
         except Exception:
             pass
@@ -729,7 +1265,7 @@ class ReferenceBrowser(ttk.Frame):
             messagebox.showwarning("No Label", "Select a label first.")
             return
         try:
-            current = get_threshold_for_label(label)
+            current = _cached_threshold(label)
         except Exception:
             current = 0.3
         val = simpledialog.askstring("Threshold", f"Threshold for '{label}' (0.0–1.0):", initialvalue=f"{current:.3f}")
@@ -742,7 +1278,7 @@ class ReferenceBrowser(ttk.Frame):
             set_threshold_for_label(label, thr)
             _write_or_refresh_metadata(label, thr)
             self.gui_log(f"🎚️ Threshold for '{label}' set to {thr:.3f}.")
-            self.schedule_rebuild_embeddings(only_label=label)
+            self.rebuild_embeddings_async(only_label=label)
         except Exception:
             messagebox.showerror("Invalid", "Threshold must be a number between 0.0 and 1.0.")
 
@@ -758,8 +1294,14 @@ class MatchReviewPanel(tk.Toplevel):
         self.output_dir = output_dir
         self.gui_log = gui_log
 
-        self._thumbs = []
+        self._thumbs = OrderedDict()  # cell index -> PhotoImage (canvas items hold no ref)
         self._checks = []   # (var, path, label_var)
+        self._cell_rects = []  # canvas rectangle id per cell (selection outline)
+        self._label_items = [] # canvas text id per cell showing its assigned label
+        # one shared Combobox, moved onto whichever cell the pointer is over
+        self._combo = None
+        self._combo_item = None
+        self._combo_cell = None
 
         top = ttk.Frame(self)
         top.pack(fill=tk.X, padx=10, pady=6)
@@ -794,14 +1336,17 @@ class MatchReviewPanel(tk.Toplevel):
 
         mid = ttk.Frame(self)
         mid.pack(fill=tk.BOTH, expand=True, padx=10, pady=6)
+        # one canvas holds every cell as image/text/rectangle items; click to
+        # select. The only per-cell widget is a single Combobox that follows
+        # the pointer; other cells show their label as canvas text.
         self.canvas = tk.Canvas(mid, bg="#ffffff")
         self.vsb = ttk.Scrollbar(mid, orient=tk.VERTICAL, command=self.canvas.yview)
         self.canvas.configure(yscrollcommand=self.vsb.set)
-        self.grid_frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.grid_frame, anchor='nw')
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.vsb.pack(side=tk.RIGHT, fill=tk.Y)
-        self.grid_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        _bind_vertical_mousewheel(self.canvas)
+        self.canvas.bind("<Button-1>", self._on_canvas_click)
+        self.canvas.bind("<Motion>", self._on_canvas_motion)
 
         self.load_unmatched()
 
@@ -812,57 +1357,150 @@ class MatchReviewPanel(tk.Toplevel):
             self.gui_log(f"📁 Open this folder manually: {self.unmatched_dir}")
 
     def load_unmatched(self):
-        for w in self.grid_frame.winfo_children():
-            w.destroy()
+        """
+        Stream the unmatched folder: a background thread walks (scandir) and
+        decodes thumbnails into a queue; the Tk thread drains it in small
+        batches, so the first cells appear immediately.
+        """
+        self.canvas.delete("all")
+        self._combo_item = None
+        self._combo_cell = None
+        self._label_items.clear()
+        had_thumbs = bool(self._thumbs)
         self._thumbs.clear()
         self._checks.clear()
-
-        paths = []
-        for sub, _, files in os.walk(self.unmatched_dir):
-            for f in files:
-                if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp")):
-                    paths.append(os.path.join(sub, f))
-
-        if not paths:
-            self.gui_log("ℹ️ No images in unmatched folder.")
-            ttk.Label(self.grid_frame, text="No unmatched images found.").grid(row=0, column=0, padx=6, pady=6)
-            return
-
-        self.gui_log(f"🖼️ Review: found {len(paths)} unmatched images.")
-        cols = 6
+        self._cell_rects.clear()
+        if had_thumbs:
+            # refcounting frees the pixmaps; sweep young cycles once the UI is idle
+            self.after_idle(gc.collect, 0)
+
+        # a new generation id makes any previous producer/drain loop retire
+        self._review_gen = getattr(self, "_review_gen", 0) + 1
+        gen = self._review_gen
+        q = queue.Queue(maxsize=64)
+        self._review_q = q
+        self._review_labels = _labels_from_entries()
         TH = (100, 100)
-        for i, p in enumerate(paths):
-            try:
-                with Image.open(p) as im:
-                    im = im.convert("RGB")
-                    im.thumbnail(TH)
-                    th = ImageTk.PhotoImage(im)
-                self._thumbs.append(th)
-
-                cell = ttk.Frame(self.grid_frame, borderwidth=1, relief="solid")
-                cell.grid(row=i // cols, column=i % cols, padx=6, pady=6)
 
-                lbl = ttk.Label(cell, image=th)
-                lbl.image = th
-                lbl.pack()
+        def _put(item):
+            while gen == self._review_gen:
+                try:
+                    q.put(item, timeout=0.2)
+                    return True
+                except queue.Full:
+                    continue
+            return False
 
-                base = os.path.basename(p)
-                ttk.Label(cell, text=base, width=18, anchor="center").pack()
+        def producer():
+            for p in _iter_image_files(self.unmatched_dir):
+                if gen != self._review_gen:
+                    return
+                try:
+                    with Image.open(p) as im:
+                        _jpeg_draft(im, TH)
+                        im = im.convert("RGB")
+                        im.thumbnail(TH, resample_for(TH))
+                        item = ("img", p, im)
+                except Exception as e:
+                    item = ("err", p, str(e))
+                if not _put(item):
+                    return
+            _put(("done", None, None))
 
-                row = ttk.Frame(cell)
-                row.pack(pady=3)
+        threading.Thread(target=producer, daemon=True).start()
+        self._drain_review_queue(gen)
 
-                var = tk.BooleanVar(value=False)
-                ttk.Checkbutton(row, variable=var).pack(side=tk.LEFT)
+    def _drain_review_queue(self, gen):
+        if gen != self._review_gen:
+            return
+        try:
+            if not self.winfo_exists():
+                self._review_gen += 1
+                return
+        except tk.TclError:
+            return
 
-                lblv = tk.StringVar(value=self.assign_label_var.get())
-                              
-                combo = ttk.Combobox(row, textvariable=lblv, values=_labels_from_entries(), state="readonly", width=12)
-                combo.pack(side=tk.LEFT, padx=4)
+        BATCH = 24
+        for _ in range(BATCH):
+            try:
+                kind, p, payload = self._review_q.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "done":
+                if not self._checks:
+                    self.gui_log("ℹ️ No images in unmatched folder.")
+                    self.canvas.create_text(8, 8, text="No unmatched images found.", anchor="nw")
+                else:
+                    self.gui_log(f"🖼️ Review: found {len(self._checks)} unmatched images.")
+                return
+            if kind == "img":
+                try:
+                    self._add_review_thumb(p, payload)
+                except Exception as e:
+                    self.gui_log(f"⚠️ Skip {p}: {e}")
+            else:
+                self.gui_log(f"⚠️ Skip {p}: {payload}")
+        self.after(30, self._drain_review_queue, gen)
+
+    def _cell_origin(self, i):
+        r, c = divmod(i, _REVIEW_COLS)
+        return c * _REVIEW_CELL_W + 6, r * _REVIEW_CELL_H + 6
+
+    def _add_review_thumb(self, p, im):
+        i = len(self._checks)
+        th = ImageTk.PhotoImage(im)
+        self._thumbs[i] = th
+
+        x, y = self._cell_origin(i)
+        w, h = _REVIEW_CELL_W - 12, _REVIEW_CELL_H - 12
+        rect = self.canvas.create_rectangle(x, y, x + w, y + h, outline="#cccccc", width=2)
+        self.canvas.create_image(x + w // 2, y + 4, image=th, anchor="n")
+        base = os.path.basename(p)
+        if len(base) > 24:
+            base = base[:21] + "…"
+        self.canvas.create_text(x + w // 2, y + 110, text=base, anchor="n")
+
+        var = tk.BooleanVar(value=False)
+        lblv = tk.StringVar(value=self.assign_label_var.get())
+        text_id = self.canvas.create_text(x + w // 2, y + 138, text=f"→ {lblv.get()}", fill="#555555", anchor="n")
+        lblv.trace_add("write", lambda *_, t=text_id, v=lblv: self.canvas.itemconfigure(t, text=f"→ {v.get()}"))
+        self._checks.append((var, p, lblv))
+        self._cell_rects.append(rect)
+        self._label_items.append(text_id)
+
+        rows = i // _REVIEW_COLS + 1
+        self.canvas.configure(scrollregion=(0, 0, _REVIEW_COLS * _REVIEW_CELL_W + 6, rows * _REVIEW_CELL_H + 6))
+
+    def _cell_at(self, event):
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        c, r = int(x // _REVIEW_CELL_W), int(y // _REVIEW_CELL_H)
+        i = r * _REVIEW_COLS + c
+        if 0 <= c < _REVIEW_COLS and 0 <= i < len(self._checks):
+            return i
+        return None
+
+    def _on_canvas_click(self, event):
+        i = self._cell_at(event)
+        if i is None:
+            return
+        var = self._checks[i][0]
+        var.set(not var.get())
+        self.canvas.itemconfigure(self._cell_rects[i], outline="#3399ff" if var.get() else "#cccccc")
 
-                self._checks.append((var, p, lblv))
-            except Exception as e:
-                self.gui_log(f"⚠️ Skip {p}: {e}")
+    def _on_canvas_motion(self, event):
+        i = self._cell_at(event)
+        if i is None or i == self._combo_cell:
+            return
+        if self._combo is None:
+            self._combo = ttk.Combobox(self.canvas, state="readonly", width=14)
+        self._combo.configure(values=self._review_labels, textvariable=self._checks[i][2])
+        x, y = self._cell_origin(i)
+        cx, cy = x + (_REVIEW_CELL_W - 12) // 2, y + 134
+        if self._combo_item is None:
+            self._combo_item = self.canvas.create_window(cx, cy, window=self._combo, anchor="n")
+        else:
+            self.canvas.coords(self._combo_item, cx, cy)
+        self._combo_cell = i
 
     def _selected_items(self):
         return [(p, lblv.get()) for var, p, lblv in self._checks if var.get()]
@@ -873,11 +1511,23 @@ class MatchReviewPanel(tk.Toplevel):
             messagebox.showinfo("Assign", "No images selected.")
             return
 
+        # one join + makedirs per label, not per file
+        dst_by_label = {}
+        for label in {label for _p, label in items}:
+            dst = os.path.join(self.output_dir, label)
+            try:
+                ensure_dir(dst)
+                dst_by_label[label] = dst
+            except Exception as e:
+                self.gui_log(f"❌ Cannot create folder for '{label}': {e}")
+        keep = self.keep_original.get()
+
         moved = 0
         for p, label in items:
+            if label not in dst_by_label:
+                continue
             try:
-                dst = os.path.join(self.output_dir, label)
-                unique_copy_or_move(p, dst, keep_original=self.keep_original.get())
+                unique_copy_or_move(p, dst_by_label[label], keep_original=keep, ensure=False)
                 moved += 1
             except Exception as e:
                 self.gui_log(f"❌ Assign failed for {p}: {e}")
@@ -890,15 +1540,37 @@ class MatchReviewPanel(tk.Toplevel):
             messagebox.showinfo("Add as Reference", "No images selected.")
             return
 
-        added = 0
-        for p, label in items:
+        labels = sorted({label for _p, label in items})
+        self.gui_log(f"⏳ Adding {len(items)} reference(s)…")
+
+        def _job():
+            # one transaction for all rows, then one embedding pass (one model
+            # load) covering every touched label — all off the Tk thread
+            err = None
+            added = 0
             try:
-                insert_reference(p, label)
-                added += 1
+                added = insert_references_bulk(items)
             except Exception as e:
-                self.gui_log(f"❌ Add reference failed for {p}: {e}")
-        self.gui_log(f"✅ Added {added} image(s) as references.")
-        messagebox.showinfo("References", f"Added {added} reference(s).")
+                err = e
+            if added:
+                try:
+                    from photo_sorter import build_reference_embeddings_for_labels
+                    model_dir = os.path.join(os.path.dirname(__file__), "buffalo_l")
+                    build_reference_embeddings_for_labels(DB_PATH, model_dir, labels, self.gui_log)
+                except Exception as e:
+                    self.gui_log(f"❌ Embedding rebuild failed: {e}")
+
+            def _done():
+                if err:
+                    self.gui_log(f"❌ Add reference failed: {err}")
+                self.gui_log(f"✅ Added {added} image(s) as references.")
+                messagebox.showinfo("References", f"Added {added} reference(s).", parent=self)
+            try:
+                self.after(0, _done)
+            except Exception:
+                pass
+
+        threading.Thread(target=_job, daemon=True).start()
 
 # ---- Settings Dialog ---------------------------------------------
 
@@ -1037,14 +1709,7 @@ class _ModalProgress:
         self.pb.start(10)
 
         # center on the screen (not just over parent)
-        self.top.update_idletasks()
-        sw = self.top.winfo_screenwidth()
-        sh = self.top.winfo_screenheight()
-        ww = self.top.winfo_reqwidth()
-        wh = self.top.winfo_reqheight()
-        xpos = (sw // 2) - (ww // 2)
-        ypos = (sh // 2) - (wh // 2)
-        self.top.geometry(f"+{xpos}+{ypos}")
+        _center_window(self.top, (330, 90))
 
     def close(self):
         try:
@@ -1068,17 +1733,7 @@ class CreateLabelDialog(tk.Toplevel):
         self.transient(master)
         self.grab_set()
         # Center over parent
-        self.update_idletasks()
-        if master:
-            x = master.winfo_rootx()
-            y = master.winfo_rooty()
-            w = master.winfo_width()
-            h = master.winfo_height()
-            ww = self.winfo_reqwidth()
-            wh = self.winfo_reqheight()
-            xpos = x + (w // 2) - (ww // 2)
-            ypos = y + (h // 2) - (wh // 2)
-            self.geometry(f"+{xpos}+{ypos}")
+        _center_window(self, (320, 150), over=master)
 
         self.result = None  # (label:str, threshold:float)
 
@@ -1151,6 +1806,10 @@ class ImageRangerGUI:
         self._thumb_cache_est_bytes = 0
         self._thumb_cache_items_limit = 2000            # ~ how many thumbs to keep
         self._thumb_cache_bytes_limit = 256 * 1024 * 1024  # ~256 MB cap
+        self._thumb_inflight = {}   # (path, size_px) -> [Label, ...] waiting on a decode
+        # evicted thumbs that some widget still shows; entries vanish with the widget
+        self._thumb_cache_weak = weakref.WeakValueDictionary()
+        self._thumb_placeholders = {}  # (size_px, broken) -> grey / red PhotoImage
 
         self.root.bind("<Control-n>", lambda e: self.create_label_from_selection())
 
@@ -1166,6 +1825,8 @@ class ImageRangerGUI:
         # workers/cancel (if you have background tasks)
         self._cancel_event = threading.Event()
         self._workers = []
+        # keep the on-disk thumb cache within budget; never blocks startup
+        threading.Thread(target=thumb_disk_cache.prune, daemon=True).start()
 
     # graceful close
         self._is_closing = False
@@ -1192,17 +1853,22 @@ class ImageRangerGUI:
         # data state
         self.selected_folder = tk.StringVar()
         self.image_paths = []
-        self.thumbnails = []
         self.selected_images = set()
         self.multi_face_mode = tk.StringVar(value=SETTINGS["default_mode"])
         self.last_unmatched_dir = None
         self.last_output_dir = None
 
         self._rebuild_after_id = None   # Tk 'after' handle for debounce
-        self._rebuild_last_label = None
+        self._zoom_after_id = None      # same, for zoom slider drags
+        self._settings_after_id = None  # same, for settings writes
+        self._zoom_pending_value = None
+        self._resize_after_id = None    # same, for grid <Configure> storms
+        self._rebuild_labels = set()    # labels queued for the next coalesced rebuild
+        self._rebuild_all = False       # a full rebuild was requested in the window
+        self._meta_after_id = None      # same, for metadata.json refreshes
+        self._pending_meta_refresh = set()  # labels whose metadata.json is stale
 
         # async/undo helpers
-        self._rebuild_pending = None
         self.undo = UndoStack()
 
         # visuals
@@ -1223,8 +1889,12 @@ class ImageRangerGUI:
         self.set_zoom_target("main")   # initial active grid highlights
 
         # Legacy compatibility shim (now UI elements exist)
+        self._rb_refresh_after_id = None  # pending _rb_flush_refresh idle callback
+        self._rb_refresh_select = None
+        self._rb_refresh_reload = False
         self.reference_browser = SimpleNamespace(
             refresh_label_list=lambda auto_select=False: self._rb_refresh_label_list(auto_select),
+            refresh=lambda label=None, reload_images=False: self._rb_refresh(label, reload_images),
             delete_label_all=lambda label: self.delete_label_all(label),
         )
 
@@ -1251,6 +1921,30 @@ class ImageRangerGUI:
         self.root.config(menu=menubar)
 
     # -----------------------------------------
+    def _rb_refresh(self, label=None, reload_images=False):
+        """
+        Shim for ReferenceBrowser.refresh(): the browser widget coalesces its own
+        refresh; the label menu and reference strip follow in one idle pass.
+        """
+        rb = getattr(self, "_ref_browser", None)
+        if rb is not None:
+            rb.refresh(label=label, reload_images=reload_images)
+        if label:
+            self._rb_refresh_select = label
+        self._rb_refresh_reload = self._rb_refresh_reload or reload_images
+        if self._rb_refresh_after_id is None:
+            self._rb_refresh_after_id = self.root.after_idle(self._rb_flush_refresh)
+
+    def _rb_flush_refresh(self):
+        self._rb_refresh_after_id = None
+        label, self._rb_refresh_select = self._rb_refresh_select, None
+        reload, self._rb_refresh_reload = self._rb_refresh_reload, False
+        self._rb_refresh_label_list(auto_select=False)
+        if label:
+            self.active_label.set(label)
+        if reload:
+            self.render_reference_strip(label or self.active_label.get())
+
     def _rb_refresh_label_list(self, auto_select: bool = False):
         labels = []
         try:
@@ -1269,13 +1963,8 @@ class ImageRangerGUI:
         if not label:
             return
         try:
-            from reference_db import get_all_references, delete_reference, set_threshold_for_label
-            refs = [r["path"] for r in get_all_references() if r["label"] == label]
-            for p in refs:
-                try:
-                    delete_reference(p)
-                except Exception:
-                    pass
+            # one transaction for all rows instead of a round-trip per ref
+            delete_references_bulk(list(_cached_refs_by_label().get(label, ())))
             try:
                 set_threshold_for_label(label, None)
             except Exception:
@@ -1314,6 +2003,22 @@ class ImageRangerGUI:
             try: release_resources()
             except Exception: pass
         except Exception: pass
+        # Flush a pending settings save synchronously (daemon threads die with us)
+        if getattr(self, "_settings_after_id", None) is not None:
+            try:
+                self.root.after_cancel(self._settings_after_id)
+                self._flush_settings(background=False)
+            except Exception: pass
+        # Stop thumbnail workers
+        try: self._cancel_thumb_job()
+        except Exception: pass
+        try:
+            with self._decode_pool_lock:
+                pool, self._decode_pool = self._decode_pool, None
+                self._decode_pool_failed = True  # late viewport jobs decode in-thread
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        except Exception: pass
         # Clear caches
         try: self._thumb_cache.clear()
         except Exception: pass
@@ -1346,135 +2051,235 @@ class ImageRangerGUI:
         )
 
     # ---------------- background thumbnail loader ----------------
+    # Only cells in (or near) the viewport are decoded. Scrolling/resizing
+    # re-runs _start_thumb_job, which cancels jobs for cells that left the
+    # window. Workers hand back PIL images; PhotoImages are built on the Tk thread.
     def _cancel_thumb_job(self):
-        self._thumb_stop = True
+        for ev in self._pending.values():
+            ev.set()
+        self._pending.clear()
+
+    def _on_grid_yscroll(self, first, last):
+        self.vbar.set(first, last)
+        self._schedule_thumb_job()
+
+    def _schedule_thumb_job(self):
+        if not self._thumb_job_scheduled:
+            self._thumb_job_scheduled = True
+            self.root.after_idle(self._start_thumb_job)
+
+    def _visible_indices(self, rows_above: int = 2, rows_below: int = 2) -> range:
+        cols, cell, size = self._grid_geom
+        n = len(self.current_images or [])
+        if not n:
+            return range(0)
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), 1)
+        first_row = max(0, int(top // cell) - rows_above)
+        last_row = int((top + height) // cell) + rows_below
+        return range(first_row * cols, min(n, (last_row + 1) * cols))
+
+    def _start_thumb_job(self):
+        self._thumb_job_scheduled = False
+        cols, cell, size = self._grid_geom
+        # lean the prefetch window toward the scroll direction; on reversal the
+        # far side falls outside the range and its decodes are cancelled below
+        top = self.canvas.canvasy(0)
+        last_top = getattr(self, "_last_grid_top", top)
+        self._last_grid_top = top
+        ahead, behind = 4, 1
+        if top > last_top:
+            visible = self._visible_indices(rows_above=behind, rows_below=ahead)
+        elif top < last_top:
+            visible = self._visible_indices(rows_above=ahead, rows_below=behind)
+        else:
+            visible = self._visible_indices()
+        on_screen = self._visible_indices(rows_above=0, rows_below=0)
+        lo, hi = visible.start, visible.stop
+
+        # cancel in-flight decodes for cells that scrolled out
+        for idx in [i for i in self._pending if i < lo or i >= hi]:
+            self._pending.pop(idx).set()
+        # recycle cells far outside the viewport (the LRU still holds the pixels)
+        margin = 4 * cols
+        for idx in [i for i in self._cell_rects if i < lo - margin or i >= hi + margin]:
+            rect = self._cell_rects.pop(idx)
+            self.canvas.itemconfigure(rect, state="hidden")
+            self._rect_pool.append(rect)
+        for idx in [i for i in self._grid_photos if i < lo - margin or i >= hi + margin]:
+            item, _img = self._grid_photos.pop(idx)
+            self.canvas.itemconfigure(item, image="", state="hidden")
+            self._img_pool.append(item)
+        for idx in visible:
+            if idx not in self._cell_rects:
+                self._place_cell_rect(idx)
 
-    def _start_thumb_job(self, paths):
-        self._cancel_thumb_job()
-        self._thumb_stop = False
         self._thumb_executor = getattr(self, "_thumb_executor", None) or ThreadPoolExecutor(max_workers=4)
-        self._thumb_queue = queue.Queue(maxsize=256)
+        gen = self._grid_gen
+        todo = [idx for idx in visible if idx not in self._grid_photos and idx not in self._pending]
+        # what's on screen first, prefetch rows after
+        todo.sort(key=lambda i: i not in on_screen)
+        if todo:
+            # one read-ahead batch for the whole viewport, queued ahead of the decodes
+            self._thumb_executor.submit(prefetch, [self.current_images[i] for i in todo])
+        for idx in todo:
+            ev = threading.Event()
+            self._pending[idx] = ev
+            self._thumb_executor.submit(self._decode_thumb_job, gen, idx, self.current_images[idx], size, ev)
+        if self._pending and not self._thumb_pumping:
+            self._thumb_pumping = True
+            self.root.after(10, self._consume_thumbs_batch)
 
-        def producer():
-            for p in paths:
-                if self._thumb_stop:
-                    break
-                cached = _thumbcache_get(p)
-                if cached is not None:
-                    self._thumb_queue.put(("ok", p, cached))
-                    continue
+    def _decode_thumb_job(self, gen, idx, path, size, ev):
+        """Worker thread: cache lookup by content fingerprint, else resample or decode."""
+        if ev.is_set():
+            return
+        try:
+            key = (_fingerprint(path), size)
+        except OSError:
+            key = (path, size)
+        cached = _thumbcache_get(key)
+        if cached is not None:
+            item = ("ok", cached)
+        else:
+            try:
+                im = _ladder_get(key[0], (size, size))
+                if im is None:
+                    raw, wh = self._decode_in_pool(path, (size, size))
+                    # wrap the pool's bytes without another copy
+                    im = Image.frombuffer("RGB", wh, raw, "raw", "RGB", 0, 1)
+                    _ladder_put(key[0], im)
+                item = ("img", (im, key))
+            except Exception as e:
+                item = ("err", str(e))
+        if not ev.is_set():
+            self._thumb_queue.put((gen, idx, path) + item)
+
+    def _get_decode_pool(self):
+        with self._decode_pool_lock:
+            if self._decode_pool is None and not self._decode_pool_failed:
                 try:
-                    with Image.open(p) as im:
-                        im = im.convert("RGB")
-                        im.thumbnail(THUMBNAIL_SIZE)
-                        bio = im.tobytes()
-                        size = im.size
-                    self._thumb_queue.put(("raw", p, (bio, size)))
-                except Exception as e:
-                    self._thumb_queue.put(("err", p, str(e)))
-            self._thumb_queue.put(("done", None, None))
+                    self._decode_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2)
+                except Exception:
+                    self._decode_pool_failed = True
+            return self._decode_pool
 
-        threading.Thread(target=producer, daemon=True).start()
-        self._consume_thumbs_batch()
+    def _decode_in_pool(self, path, size):
+        """
+        Run decode_one in the process pool (PIL holds the GIL); in-thread once
+        the pool can't start or has broken. Decode errors propagate as usual.
+        """
+        pool = self._get_decode_pool()
+        if pool is not None:
+            try:
+                return pool.submit(decode_one, path, size).result()
+            except BrokenProcessPool:
+                with self._decode_pool_lock:
+                    if self._decode_pool is pool:
+                        self._decode_pool = None
+                        self._decode_pool_failed = True
+                pool.shutdown(wait=False, cancel_futures=True)
+        return decode_one(path, size)
 
     def _consume_thumbs_batch(self):
         BATCH = 24
-        consumed = 0
-        while consumed < BATCH:
+        for _ in range(BATCH):
             try:
-                kind, path, payload = self._thumb_queue.get_nowait()
+                gen, idx, path, kind, payload = self._thumb_queue.get_nowait()
             except queue.Empty:
                 break
-            if kind == "done":
-                gc.collect()
-                return
-            if self._thumb_stop:
-                continue
+            if gen != self._grid_gen or self._pending.pop(idx, None) is None:
+                continue  # stale grid or cancelled after it finished
             if kind == "ok":
-                thumb = payload
-                self._add_thumbnail_widget(path, thumb)
-            elif kind == "raw":
-                raw, size = payload
+                self._draw_cell_thumb(idx, payload)
+            elif kind == "img":
+                im, key = payload
                 try:
-                    im = Image.frombytes("RGB", size, raw)
                     tkimg = ImageTk.PhotoImage(im)
-                    _thumbcache_put(path, tkimg)
-                    self._add_thumbnail_widget(path, tkimg)
+                    _thumbcache_put(key, tkimg)
+                    self._draw_cell_thumb(idx, tkimg)
                 except Exception as e:
                     self.gui_log(f"[Thumb build error] {path}: {e}")
             else:
-                self.gui_log(f"[Thumbnail error] {path}: {payload}")
-            consumed += 1
-        if not self._thumb_stop:
+                self._draw_cell_thumb(idx, None)
+        if self._pending:
             self.root.after(10, self._consume_thumbs_batch)
-
-    def _add_thumbnail_widget(self, img_path, tkimg):
-        idx = len(self.thumbnails)
-        self.thumbnails.append(tkimg)
-        frame = ttk.Frame(self.scrollable_frame, borderwidth=2, relief="solid", style="TFrame")
-        frame.grid(row=idx // 6, column=idx % 6, padx=5, pady=5)
-        label = ttk.Label(frame, image=tkimg)
-        label.image = tkimg
-        label.pack()
-        def toggle_selection(p=img_path, f=frame):
-            if p in self.selected_images:
-                self.selected_images.remove(p)
-                f.configure(style="TFrame")
-            else:
-                self.selected_images.add(p)
-                f.configure(style="Selected.TFrame")
-        label.bind("<Button-1>", lambda e, path=img_path, fr=frame: toggle_selection(path, fr))
+        else:
+            self._thumb_pumping = False
+
+    def _place_cell_rect(self, idx):
+        cols, cell, size = self._grid_geom
+        r, c = divmod(idx, cols)
+        x, y = c * cell + self.grid_gutter // 2, r * cell + self.grid_gutter // 2
+        style = self._cell_sel_style(idx in self.selected_indices)
+        if self._rect_pool:
+            rect = self._rect_pool.pop()
+            self.canvas.coords(rect, x, y, x + size, y + size)
+            self.canvas.itemconfigure(rect, state="normal", **style)
+        else:
+            rect = self.canvas.create_rectangle(
+                x, y, x + size, y + size, fill="#202020", tags=("cell",), **style)
+        self._cell_rects[idx] = rect
+
+    def _draw_cell_thumb(self, idx, tkimg):
+        cols, cell, size = self._grid_geom
+        r, c = divmod(idx, cols)
+        cx = c * cell + self.grid_gutter // 2 + size // 2
+        cy = r * cell + self.grid_gutter // 2 + size // 2
+        if tkimg is None:
+            # unreadable image: the shared grey tile, so the item stays recyclable
+            tkimg = self._thumb_placeholder(size)
+        if self._img_pool:
+            item = self._img_pool.pop()
+            self.canvas.coords(item, cx, cy)
+            self.canvas.itemconfigure(item, image=tkimg, state="normal")
+            self.canvas.tag_raise(item)  # above placeholders created after it
+        else:
+            item = self.canvas.create_image(cx, cy, image=tkimg, tags=("cell",))
+        self._grid_photos[idx] = (item, tkimg)
 
     # ---------------- settings ----------------
     def _on_settings_saved(self, values: dict):
         SETTINGS.update(values)
-        save_settings(SETTINGS)
+        _invalidate_reference_caches()  # reference_root may have moved
+        self._schedule_settings_save()
         self.apply_styles()
+        for idx in self.selected_indices:
+            self._paint_cell_sel(idx)
         self.multi_face_mode.set(SETTINGS["default_mode"])
         self.reference_browser.refresh_label_list(auto_select=False)
         self.gui_log("⚙️ Preferences saved and applied.")
 
+    def _schedule_settings_save(self, delay_ms=300):
+        """Coalesce saves; the file write happens on a worker thread."""
+        if self._settings_after_id is not None:
+            try: self.root.after_cancel(self._settings_after_id)
+            except Exception: pass
+        self._settings_after_id = self.root.after(delay_ms, self._flush_settings)
+
+    def _flush_settings(self, background=True):
+        self._settings_after_id = None
+        snapshot = dict(SETTINGS)
+        if background:
+            threading.Thread(target=save_settings, args=(snapshot,), daemon=True).start()
+        else:
+            save_settings(snapshot)
+
     def open_settings_dialog(self):
         SettingsDialog(self.root, SETTINGS, self._on_settings_saved)
 
     # ---------------- embeddings rebuild (debounced + threaded) ----------------
-    def rebuild_embeddings_async(self, only_label: str | None = None):
-        if getattr(self, "_rebuild_pending", None):
-            try:
-                self.root.after_cancel(self._rebuild_pending)
-            except Exception:
-                pass
-            self._rebuild_pending = None
-        self._rebuild_pending = self.root.after(200, lambda ol=only_label: self._rebuild_do(ol))
-
-    def _rebuild_do(self, only_label: str | None):
-        self._rebuild_pending = None
-        def _runner(label=only_label):
-            model_dir = os.path.join(os.path.dirname(__file__), "buffalo_l")
-            try:
-                if label:
-                    from photo_sorter import build_reference_embeddings_for_labels
-                    self.gui_log(f"⚙️ Rebuilding embeddings for '{label}'…")
-                    build_reference_embeddings_for_labels(DB_PATH, model_dir, [label], self.gui_log)
-                else:
-                    from photo_sorter import build_reference_embeddings_from_db
-                    self.gui_log("⚙️ Rebuilding reference embeddings…")
-                    build_reference_embeddings_from_db(DB_PATH, model_dir, self.gui_log)
-                self.gui_log("✅ Embeddings rebuilt.")
-            except Exception as e:
-                self.gui_log(f"❌ Embedding rebuild failed: {e}")
-        threading.Thread(target=_runner, daemon=True).start()
-
-
-
-# ------------------------Debounce multiple rebuild requests into one."--------------------------
-    # ---- Debounce state (keep if you already have it) ----
-    # self._rebuild_after_id = None
-    # self._rebuild_last_label = None
-    
     def schedule_rebuild_embeddings(self, only_label=None, delay_ms=400):
-        """Debounce multiple rebuild requests into one; accepts label but will ignore it if backend doesn't support it."""
-        self._rebuild_last_label = (only_label or "").strip() or None
+        """
+        Coalesce rebuild requests: every label asked for within the window is
+        rebuilt in one pass (one model load); a label-less request widens it to a
+        full rebuild.
+        """
+        label = (only_label or "").strip() or None
+        if label is None:
+            self._rebuild_all = True
+        else:
+            self._rebuild_labels.add(label)
         if self._rebuild_after_id is not None:
             try: self.root.after_cancel(self._rebuild_after_id)
             except Exception: pass
@@ -1482,34 +2287,59 @@ class ImageRangerGUI:
     
     def _run_rebuild_coalesced(self):
         self._rebuild_after_id = None
-        label = self._rebuild_last_label
-        self._rebuild_last_label = None
-        self.rebuild_embeddings_async(only_label=label)
+        labels = None if self._rebuild_all else sorted(self._rebuild_labels)
+        self._rebuild_all = False
+        self._rebuild_labels = set()
+        self._start_rebuild(labels)
+    
+    def schedule_metadata_refresh(self, label, delay_ms=500):
+        """Queue a metadata.json refresh; each label is rewritten once per window."""
+        if not label:
+            return
+        self._pending_meta_refresh.add(label)
+        if self._meta_after_id is None:
+            self._meta_after_id = self.root.after(delay_ms, self._flush_pending_meta)
+    
+    def _flush_pending_meta(self):
+        self._meta_after_id = None
+        labels, self._pending_meta_refresh = self._pending_meta_refresh, set()
+        for label in labels:
+            try:
+                _write_or_refresh_metadata(label)
+            except Exception:
+                pass
     
     def rebuild_embeddings_async(self, only_label=None):
-        """Threaded rebuild + spinner; auto-detects whether backend supports 'only_label'."""
+        """Menu/legacy entry point; routed through the coalescing queue."""
+        self.schedule_rebuild_embeddings(only_label=only_label, delay_ms=0)
+    
+    def _start_rebuild(self, labels):
+        """Threaded rebuild + spinner. labels=None rebuilds everything."""
         if getattr(self, "_cancel_event", None) and self._cancel_event.is_set():
             return
+        if self._is_busy:
+            # something else owns the spinner; try again shortly
+            for label in labels or ():
+                self._rebuild_labels.add(label)
+            if labels is None:
+                self._rebuild_all = True
+            self._rebuild_after_id = self.root.after(400, self._run_rebuild_coalesced)
+            return
     
         self.begin_busy("Rebuilding embeddings…")
     
         def _job():
-            import inspect
             err = None
+            model_dir = os.path.join(os.path.dirname(__file__), "buffalo_l")
             try:
-                from photo_sorter import build_reference_embeddings_from_db
-                # detect if function accepts 'only_label'
-                sig = None
-                try:
-                    sig = inspect.signature(build_reference_embeddings_from_db(DB_PATH, MODEL_DIR, log_callback))
-                except Exception:
-                    sig = None
-    
-                if sig and "only_label" in sig.parameters and only_label:
-                    build_reference_embeddings_from_db(only_label=only_label)
+                if labels:
+                    from photo_sorter import build_reference_embeddings_for_labels
+                    self.gui_log(f"⚙️ Rebuilding embeddings for {', '.join(repr(l) for l in labels)}…")
+                    build_reference_embeddings_for_labels(DB_PATH, model_dir, labels, self.gui_log)
                 else:
-                    # fallback: call without kwarg
-                    build_reference_embeddings_from_db()
+                    from photo_sorter import build_reference_embeddings_from_db
+                    self.gui_log("⚙️ Rebuilding reference embeddings…")
+                    build_reference_embeddings_from_db(DB_PATH, model_dir, self.gui_log)
             except Exception as e:
                 err = e
     
@@ -1523,31 +2353,11 @@ class ImageRangerGUI:
             except Exception:
                 pass
     
-        import threading
         t = threading.Thread(target=_job, daemon=True)
         t.start()
         try: self._workers.append(t)
         except Exception: pass
 
-# --------------------------------------------------------------------
-    def _rebuild_do(self, only_label: str | None):
-        self._rebuild_pending = None
-        def _runner(label=only_label):
-            model_dir = os.path.join(os.path.dirname(__file__), "buffalo_l")
-            try:
-                if label:
-                    from photo_sorter import build_reference_embeddings_for_labels
-                    self.gui_log(f"⚙️ Rebuilding embeddings for '{label}'…")
-                    build_reference_embeddings_for_labels(DB_PATH, model_dir, [label], self.gui_log)
-                else:
-                    from photo_sorter import build_reference_embeddings_from_db
-                    self.gui_log("⚙️ Rebuilding reference embeddings…")
-                    build_reference_embeddings_from_db(DB_PATH, model_dir, self.gui_log)
-                self.gui_log("✅ Embeddings rebuilt.")
-            except Exception as e:
-                self.gui_log(f"❌ Embedding rebuild failed: {e}")
-        threading.Thread(target=_runner, daemon=True).start()
-
     # ---------------- layout ----------------
     def build_layout(self):
         # ====== Paned root: sidebar | right ======
@@ -1580,37 +2390,24 @@ class ImageRangerGUI:
         self.status_right = tk.Label(topbar, text="Photos in view: 0   Selected: 0", fg="#bbb", bg="#111")
         self.status_right.pack(side=tk.RIGHT, padx=10)
     
-        # quick placeholders (swap later with icons)
-        btnbar = tk.Frame(topbar, bg="#111"); btnbar.pack(side=tk.RIGHT, padx=8)
-        for txt, cb in [("🗂", self.action_toggle_view), ("↕", self.action_sort_menu),
-                        ("⭐", self.action_flag_selected), ("⚙", self.action_settings)]:
-            ttk.Button(btnbar, text=txt, width=2, command=cb).pack(side=tk.LEFT, padx=2)
-        
         # ---------------------------------------------------------
         # spinner (hidden by default)
         self.busy = ttk.Progressbar(topbar, mode="indeterminate", length=90)
         # pack it on demand in begin_busy()
-        
-        # ... when creating quick buttons and the "📂 Open" button:
-        # keep references so we can disable/enable while busy
-        # Example:
-        # open button
-        open_btn = ttk.Button(btnbar, text="📂 Open", command=self.choose_folder)
-        open_btn.pack(side=tk.LEFT, padx=2)
-        
-        # add your existing buttons (🗂, ↕, ⭐, ⚙) and collect them:
-        btn_toggle = ttk.Button(btnbar, text="🗂", width=2, command=self.action_toggle_view); btn_toggle.pack(side=tk.LEFT, padx=2)
-        btn_sort   = ttk.Button(btnbar, text="↕",  width=2, command=self.action_sort_menu);  btn_sort.pack(side=tk.LEFT, padx=2)
-        btn_flag   = ttk.Button(btnbar, text="⭐",  width=2, command=self.action_flag_selected); btn_flag.pack(side=tk.LEFT, padx=2)
-        btn_sett   = ttk.Button(btnbar, text="⚙",  width=2, command=self.action_settings);   btn_sett.pack(side=tk.LEFT, padx=2)
-        
-        # register all toolbar buttons we want to disable while busy
-        self._buttons_to_disable.extend([open_btn, btn_toggle, btn_sort, btn_flag, btn_sett])
 
-        # quick “free memory” button in the toolbar
-        btn_clear = ttk.Button(btnbar, text="🧹", width=2, command=self.clear_thumb_cache)
-        btn_clear.pack(side=tk.LEFT, padx=2)
-        self._buttons_to_disable.append(btn_clear)
+        # toolbar: one Canvas and one click handler (x -> action) rather than a
+        # ttk.Button widget per icon; greyed out and ignored while busy
+        self._toolbar_actions = [
+            ("📂 Open", self.choose_folder),
+            ("🗂", self.action_toggle_view),
+            ("↕", self.action_sort_menu),
+            ("⭐", self.action_flag_selected),
+            ("⚙", self.action_settings),
+            ("🧹", self.clear_thumb_cache),   # quick “free memory”
+        ]
+        self.toolbar = tk.Canvas(topbar, height=26, bg="#111", highlightthickness=0)
+        self.toolbar.pack(side=tk.RIGHT, padx=8)
+        self._build_toolbar()
 
 
         # ====== Vertical split: reference strip | main grid ======
@@ -1634,19 +2431,30 @@ class ImageRangerGUI:
         # ====== Main grid (scrollable) ======
         self.canvas = tk.Canvas(self.grid_container, bg="#171717", highlightthickness=0)
         self.vbar = ttk.Scrollbar(self.grid_container, orient=tk.VERTICAL, command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.vbar.set)
+        self.canvas.configure(yscrollcommand=self._on_grid_yscroll)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.vbar.pack(side=tk.RIGHT, fill=tk.Y)
     
-        self.inner = tk.Frame(self.canvas, bg="#171717")
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.inner, anchor="nw")
-    
-        self.inner.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+        # cells are canvas items (rect + image), not widgets; one click handler
+        self._cell_rects = {}   # idx -> placeholder rect, viewport (+margin) only
+        self._grid_photos = {}  # idx -> (canvas item, PhotoImage) for drawn cells
+        self._rect_pool = []    # hidden rect / image items waiting to be reused
+        self._img_pool = []
+        self._grid_geom = (1, 1, 1)  # cols, cell pitch, thumb size
+        # viewport-driven decoding: idx -> cancel Event for in-flight jobs
+        self._pending = {}
+        self._grid_gen = 0
+        self._thumb_queue = queue.Queue()
+        self._decode_pool = None  # ProcessPoolExecutor, created on first decode
+        self._decode_pool_failed = False
+        self._decode_pool_lock = threading.Lock()  # the viewport jobs race to create it
+        self._thumb_pumping = False
+        self._thumb_job_scheduled = False
         self.canvas.bind("<Configure>", self.on_canvas_resize)
     
         # Make grids activate the shared zoom slider
-        self.canvas.bind("<Button-1>", lambda e: self.set_zoom_target("main"))
-        self.inner.bind("<Button-1>",  lambda e: self.set_zoom_target("main"))
+        self.canvas.bind("<Button-1>", self._on_grid_click)
+        self.canvas.bind("<Control-Button-1>", self._on_grid_click)
        
     # ----------------- Sidebar scaffolding -----------
     def build_sidebar_contents(self): 
@@ -1683,10 +2491,11 @@ class ImageRangerGUI:
         self.reference_browser = ReferenceBrowser(
             self.ref_frame,
             gui_log=self.gui_log,
-            rebuild_embeddings_async=self.rebuild_embeddings_async,
+            rebuild_embeddings_async=self.schedule_rebuild_embeddings,
             undo_push=self.undo.push if hasattr(self, "undo") else None
         )
         self.reference_browser.pack(fill=tk.BOTH, expand=True)
+        self._ref_browser = self.reference_browser  # the shim replaces the attribute later
 
       
         # filmstrip (horizontal scroll)
@@ -1705,7 +2514,12 @@ class ImageRangerGUI:
     def clear_thumb_cache(self):
         try:
             self._thumb_cache.clear()
+            self._thumb_cache_weak.clear()
             self._thumb_cache_est_bytes = 0
+            with _THUMB_CACHE_LOCK:
+                _THUMB_CACHE.clear()
+                _THUMB_LADDER.clear()
+            threading.Thread(target=thumb_disk_cache.clear, daemon=True).start()
             self.set_status_left("Thumbnail cache cleared.")
         except Exception:
             pass
@@ -1714,48 +2528,114 @@ class ImageRangerGUI:
    
     #------------------------------------------------
     def render_reference_strip(self, label=None):
-        for w in self.ref_inner.winfo_children(): w.destroy()
         label = label or self.reference_browser.label_filter.get()
-        if not label: return
-    
-        try:
-            from reference_db import get_all_references
-            refs = [r["path"] for r in get_all_references() if r["label"] == label]
-        except Exception:
-            refs = []
-    
+        refs = ()
+        if label:
+            try:
+                refs = _cached_refs_by_label().get(label, ())
+            except Exception:
+                refs = ()
         size = int(self.ref_thumb_size.get())
         gutter = 8
-        self._ref_thumbs = []
-    
+
+        sig = (label, size, refs)
+        if sig == getattr(self, "_ref_strip_sig", None):
+            return  # nothing changed since the last render
+        self._ref_strip_sig = sig
+
+        # diff against the current strip: reuse frames whose path is still listed
+        # (one per occurrence; a path can be listed twice), create only the new
+        # ones, destroy whatever is left over
+        old = {}  # path -> [(frame, label), ...] in strip order
+        for p, f, lbl in zip(getattr(self, "_ref_paths", ()), getattr(self, "_ref_frames", ()),
+                             getattr(self, "_ref_labels", ())):
+            f.pack_forget()
+            old.setdefault(p, []).append((f, lbl))
+
+        # parallel arrays; widgets carry their index, one shared click handler
+        self._ref_frames = []
+        self._ref_labels = []
+        self._ref_paths = []
         for i, p in enumerate(refs):
-            f = tk.Frame(self.ref_inner, width=size, height=size, bg="#1c1c1c",
-                         highlightthickness=2, highlightbackground="#2a2a2a")
-            f.pack(side=tk.LEFT, padx=(gutter,0), pady=6); f.pack_propagate(False)
-            ph = self.load_thumb(p, size)
-            if ph:
-                lbl = tk.Label(f, image=ph, bg="#1c1c1c"); lbl.image = ph
+            reused = old.get(p)
+            if reused:
+                f, lbl = reused.pop(0)
+                if not reused:
+                    del old[p]
+                if int(f.cget("width")) != size:
+                    f.configure(width=size, height=size)
+                    ph = self.load_thumb(p, size, widget=lbl)
+                    if ph:
+                        lbl.configure(image=ph); lbl.image = ph
+            else:
+                f = tk.Frame(self.ref_inner, width=size, height=size, bg="#1c1c1c",
+                             highlightthickness=2, highlightbackground="#2a2a2a")
+                f.pack_propagate(False)
+                lbl = tk.Label(f, bg="#1c1c1c")
+                ph = self.load_thumb(p, size, widget=lbl)
+                if ph:
+                    lbl.configure(image=ph); lbl.image = ph
                 lbl.pack(fill=tk.BOTH, expand=True)
-    
-            def on_click(e, frame=f):
-                bg = frame.cget("highlightbackground")
-                frame.config(highlightbackground="#69a7ff" if bg != "#69a7ff" else "#2a2a2a")
-            f.bind("<Button-1>", on_click)
-            for w in f.winfo_children(): w.bind("<Button-1>", on_click)
-    
-            self._ref_thumbs.append((f, p))
+                f.bind("<Button-1>", self._on_ref_strip_click)
+                lbl.bind("<Button-1>", self._on_ref_strip_click)
+            f.pack(side=tk.LEFT, padx=(gutter,0), pady=6)
+            f._ref_idx = lbl._ref_idx = i
+
+            self._ref_frames.append(f)
+            self._ref_labels.append(lbl)
+            self._ref_paths.append(p)
+        for leftovers in old.values():
+            for f, _lbl in leftovers:
+                f.destroy()
+        if not label:
+            return
     
         # adjust height to size
         try:
             self.ref_canvas.config(height=max(110, size + 14))
         except Exception: pass
     
-        self.ref_inner.update_idletasks()
-        bbox = self.ref_canvas.bbox(self.ref_canvas_window)
-        if bbox:
-            width = bbox[2] - bbox[0]
-            self.ref_canvas.configure(scrollregion=(0,0,width,max(110, size+14)))
+        # strip width is known arithmetically (frame + 2px highlight each side +
+        # gutter); no update_idletasks() to force the pending layout just to
+        # measure it — <Configure> on ref_inner corrects it after the idle pass
+        width = len(refs) * (size + 4 + gutter)
+        self.ref_canvas.configure(scrollregion=(0,0,width,max(110, size+14)))
+
+    def _on_ref_strip_click(self, event):
+        i = getattr(event.widget, "_ref_idx", None)
+        if i is None or i >= len(self._ref_frames):
+            return
+        frame = self._ref_frames[i]
+        bg = frame.cget("highlightbackground")
+        frame.config(highlightbackground="#69a7ff" if bg != "#69a7ff" else "#2a2a2a")
     # -----------------------------------------------
+    def _build_toolbar(self):
+        fnt = tkfont.nametofont("TkDefaultFont")
+        self._toolbar_edges = []  # right edge (incl. gap) per action, ascending
+        self._toolbar_items = []  # (rect, text) canvas ids per action
+        x = 0
+        for text, _cb in self._toolbar_actions:
+            w = fnt.measure(text) + 14
+            rect = self.toolbar.create_rectangle(x, 1, x + w, 25, fill="#222", outline="#333")
+            txt = self.toolbar.create_text(x + w // 2, 13, text=text, fill="#ddd", font=fnt)
+            self._toolbar_items.append((rect, txt))
+            x += w + 4
+            self._toolbar_edges.append(x)
+        self.toolbar.configure(width=x)
+        self.toolbar.bind("<Button-1>", self._on_toolbar_click)
+
+    def _on_toolbar_click(self, event):
+        if self._is_busy:
+            return
+        i = bisect.bisect_right(self._toolbar_edges, event.x)
+        if i < len(self._toolbar_actions):
+            self._toolbar_actions[i][1]()
+
+    def _set_toolbar_enabled(self, enabled: bool):
+        fg = "#ddd" if enabled else "#555"
+        for _rect, txt in getattr(self, "_toolbar_items", ()):
+            self.toolbar.itemconfigure(txt, fill=fg)
+
     def begin_busy(self, msg="Working…"):
         if self._is_busy:
             return
@@ -1768,6 +2648,7 @@ class ImageRangerGUI:
         except Exception:
             pass
         # disable buttons
+        self._set_toolbar_enabled(False)
         for b in self._buttons_to_disable:
             try: b.configure(state=tk.DISABLED)
             except Exception: pass
@@ -1785,23 +2666,21 @@ class ImageRangerGUI:
         except Exception:
             pass
         # enable buttons
+        self._set_toolbar_enabled(True)
         for b in self._buttons_to_disable:
             try: b.configure(state=tk.NORMAL)
             except Exception: pass
 
     #----------------------------------------------
+    # simple cleanup; adjust to your rules if needed
+    _SANITIZE_TABLE = str.maketrans({c: "_" for c in '<>:"/\\|?*'})
+
     def _sanitize_label(self, s: str) -> str:
-        s = (s or "").strip()
-        # simple cleanup; adjust to your rules if needed
-        bad = '<>:"/\\|?*'
-        for ch in bad:
-            s = s.replace(ch, "_")
-        return s
+        return (s or "").strip().translate(self._SANITIZE_TABLE)
     
     def _ensure_label_registered(self, label: str):
         """Optional: set default threshold so the label appears in lists, even if your DB doesn't have a 'labels' table."""
         try:
-            from reference_db import set_threshold_for_label
             set_threshold_for_label(label, 0.30)
         except Exception:
             # fine if unsupported
@@ -1841,15 +2720,8 @@ class ImageRangerGUI:
         if self.selected_indices:
             if messagebox.askyesno("Add references", f"Add {len(self.selected_indices)} selected photo(s) to '{label}'?"):
                 try:
-                    from reference_db import insert_reference
                     to_add = [self.current_images[i] for i in sorted(self.selected_indices) if 0 <= i < len(self.current_images)]
-                    added = 0
-                    for p in to_add:
-                        try:
-                            insert_reference(p, label)
-                            added += 1
-                        except Exception:
-                            pass
+                    added = insert_references_bulk([(p, label) for p in to_add])
                     self.set_status_left(f"Added {added} reference(s) to '{label}'. Rebuilding…")
                     self.render_reference_strip(label)
                     self.schedule_rebuild_embeddings(only_label=label)
@@ -1872,15 +2744,11 @@ class ImageRangerGUI:
     def load_images_from_folder(self, folder: str):
         self.begin_busy("Scanning folder…")
         def _scan():
-            exts = {".jpg",".jpeg",".png",".webp",".bmp",".gif",".tif",".tiff"}
+            exts = frozenset((".jpg",".jpeg",".png",".webp",".bmp",".gif",".tif",".tiff"))
             paths = []
             err = None
             try:
-                for root, dirs, files in os.walk(folder):
-                    for fn in files:
-                        if os.path.splitext(fn)[1].lower() in exts:
-                            paths.append(os.path.join(root, fn))
-                paths.sort()
+                paths = sorted(_iter_image_files(folder, exts))
             except Exception as e:
                 err = e
     
@@ -1901,8 +2769,7 @@ class ImageRangerGUI:
     # -----------------------------------------------
     def get_all_label_names(self):
         try:
-            from reference_db import get_all_labels
-            return get_all_labels()
+            return list(_cached_label_names())
         except Exception:
             return []
     
@@ -1918,15 +2785,55 @@ class ImageRangerGUI:
     
     # --------------Main grid (zoomable + multi-select)--------------------------------
     def on_canvas_resize(self, event):
-        self.render_grid()
+        # only a column-count change needs a relayout; coalesce drag-resizes
+        if self._resize_after_id is not None:
+            try: self.root.after_cancel(self._resize_after_id)
+            except Exception: pass
+        self._resize_after_id = self.root.after(120, self._apply_canvas_resize)
+    
+    def _apply_canvas_resize(self):
+        self._resize_after_id = None
+        cell = int(self.main_thumb_size.get()) + self.grid_gutter
+        cols = max(1, (self.canvas.winfo_width() or self.canvas.winfo_reqwidth()) // cell)
+        if self.current_images and not self._cell_rects:
+            self.render_grid()
+        elif cols != self._grid_geom[0] and self._grid_geom[1] == cell:
+            self._reflow_grid(cols)
+        elif cols != self._grid_geom[0]:
+            self.render_grid()
+        else:
+            self._schedule_thumb_job()  # taller/shorter viewport: just refill
+
+    def _reflow_grid(self, cols):
+        """Column count changed at the same thumb size: move live items, keep their pixels."""
+        _old_cols, cell, size = self._grid_geom
+        self._grid_geom = (cols, cell, size)
+        half = self.grid_gutter // 2
+        for idx, rect in self._cell_rects.items():
+            r, c = divmod(idx, cols)
+            x, y = c * cell + half, r * cell + half
+            self.canvas.coords(rect, x, y, x + size, y + size)
+        for idx, (item, _img) in self._grid_photos.items():
+            r, c = divmod(idx, cols)
+            self.canvas.coords(item, c * cell + half + size // 2, r * cell + half + size // 2)
+        rows = (len(self.current_images) + cols - 1) // cols
+        self.canvas.configure(scrollregion=(0, 0, cols * cell, rows * cell))
+        self._schedule_thumb_job()  # recycles what fell out, fills what came in
     
     def render_grid(self, images=None):
         if images is not None:
             self.current_images = images
     
-        for w in self.inner.winfo_children(): w.destroy()
+        self._cancel_thumb_job()
+        self._grid_gen += 1
+        self.canvas.delete("cell")
+        self._cell_rects = {}
+        self._grid_photos = {}
+        self._rect_pool = []
+        self._img_pool = []
     
         if not self.current_images:
+            self.canvas.configure(scrollregion=(0, 0, 0, 0))
             self.set_status_right(0, len(self.selected_indices)); return
     
         gutter = self.grid_gutter
@@ -1935,72 +2842,137 @@ class ImageRangerGUI:
     
         avail_w = self.canvas.winfo_width() or self.canvas.winfo_reqwidth()
         cols = max(1, avail_w // cell)
+        self._grid_geom = (cols, cell, size)
     
-        self.thumb_buttons = []
-        for idx, path in enumerate(self.current_images):
-            r, c = divmod(idx, cols)
-            frame = tk.Frame(self.inner, width=size, height=size, bg="#202020", highlightthickness=2)
-            frame.grid(row=r, column=c, padx=gutter//2, pady=gutter//2); frame.grid_propagate(False)
-    
-            ph = self.load_thumb(path, size)
-            if ph:
-                lbl = tk.Label(frame, image=ph, bg="#202020"); 
-                lbl.image = ph
-                lbl.pack(fill=tk.BOTH, expand=True)
-            else:
-                # fallback visual for unreadable images
-                tk.Label(frame, text="(no preview)", fg="#aaa", bg="#202020").pack(expand=True, fill=tk.BOTH)
-                
-            frame.config(highlightbackground="#69a7ff" if idx in self.selected_indices else "#2a2a2a")
-    
-            def on_click(e, i=idx): self.toggle_select(i)
-            def on_ctrl_click(e, i=idx): self.toggle_select(i)
-            frame.bind("<Button-1>", on_click)
-            frame.bind("<Control-Button-1>", on_ctrl_click)
-            for w in frame.winfo_children():
-                w.bind("<Button-1>", on_click)
-                w.bind("<Control-Button-1>", on_ctrl_click)
-    
-            self.thumb_buttons.append(frame)
-    
+        # no per-photo items here: the thumb job places (and recycles) cells
+        # for the viewport only; the scrollregion stands in for the rest
+        rows = (len(self.current_images) + cols - 1) // cols
         self.set_status_right(len(self.current_images), len(self.selected_indices))
-        self.inner.update_idletasks()
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        self.canvas.configure(scrollregion=(0, 0, cols * cell, rows * cell))
+        self._schedule_thumb_job()
+    
+    def _grid_index_at(self, event):
+        cols, cell, size = self._grid_geom
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        c, r = int(x // cell), int(y // cell)
+        idx = r * cols + c
+        if 0 <= c < cols and 0 <= idx < len(self.current_images):
+            return idx
+        return None
+    
+    def _on_grid_click(self, event):
+        self.set_zoom_target("main")
+        idx = self._grid_index_at(event)
+        if idx is not None:
+            self.toggle_select(idx)
     # ------------------------------------------------
     def _estimate_thumb_bytes(self, size_px: int) -> int:
         # rough RGBA estimate; Tk PhotoImage is platform-dependent, but this is a safe upper bound
         return int(size_px) * int(size_px) * 4
     
     def _evict_cache_if_needed(self):
-        # Evict by size first, then by count; pop oldest first (LRU)
-        while self._thumb_cache_est_bytes > self._thumb_cache_bytes_limit and self._thumb_cache:
-            (k_path, k_size), (img, est) = self._thumb_cache.popitem(last=False)
-            self._thumb_cache_est_bytes -= est
-        while len(self._thumb_cache) > self._thumb_cache_items_limit and self._thumb_cache:
-            (k_path, k_size), (img, est) = self._thumb_cache.popitem(last=False)
+        # One LRU pass against both limits; returns as soon as we're within them
+        cache = self._thumb_cache
+        while cache and (self._thumb_cache_est_bytes > self._thumb_cache_bytes_limit
+                         or len(cache) > self._thumb_cache_items_limit):
+            key, (img, est) = cache.popitem(last=False)
             self._thumb_cache_est_bytes -= est
+            self._thumb_cache_weak[key] = img
     
-    def load_thumb(self, path: str, size: int):
+    def load_thumb(self, path: str, size: int, widget=None):
+        """
+        Cached PhotoImage for (path, size). On a miss with `widget` given, return
+        a grey placeholder and decode on the thumb pool; the widget's image is
+        swapped in once ready. Without `widget`, decode synchronously.
+        """
         key = (path, int(size))
-        if key in self._thumb_cache:
-            # touch: move to end (most recently used)
-            img, est = self._thumb_cache.pop(key)
-            self._thumb_cache[key] = (img, est)
-            return img
-        try:
-            im = Image.open(path)
-            if im.mode not in ("RGB", "RGBA"):
-                im = im.convert("RGB")
-            im.thumbnail((int(size), int(size)))
-            ph = ImageTk.PhotoImage(im)
-            est = self._estimate_thumb_bytes(int(size))
-            # insert and evict if necessary
+        hit = self._thumb_cache.get(key)
+        if hit is not None:
+            # touch: one C-level relink, no pop/reinsert rehash
+            self._thumb_cache.move_to_end(key)
+            return hit[0]
+        ph = self._thumb_cache_weak.pop(key, None)
+        if ph is not None:
+            # still on screen somewhere: promote back instead of decoding again
+            est = ph.width() * ph.height() * 4
             self._thumb_cache[key] = (ph, est)
             self._thumb_cache_est_bytes += est
             self._evict_cache_if_needed()
             return ph
+        if widget is None:
+            im = self._decode_ref_thumb(path, int(size))
+            return self._install_thumb(key, im) if im is not None else None
+
+        waiting = self._thumb_inflight.get(key)
+        if waiting is None:
+            self._thumb_inflight[key] = [widget]
+            self._thumb_executor = getattr(self, "_thumb_executor", None) or ThreadPoolExecutor(max_workers=4)
+            self._thumb_executor.submit(self._decode_ref_thumb_job, key)
+        else:
+            waiting.append(widget)
+        return self._thumb_placeholder(int(size))
+
+    def _thumb_placeholder(self, size: int, broken: bool = False):
+        ph = self._thumb_placeholders.get((size, broken))
+        if ph is None:
+            ph = tk.PhotoImage(width=size, height=size)
+            ph.put("#4a2424" if broken else "#2a2a2a", to=(0, 0, size, size))
+            self._thumb_placeholders[(size, broken)] = ph
+        return ph
+
+    @staticmethod
+    def _decode_ref_thumb(path: str, size: int):
+        # PIL only; PhotoImage creation has to stay on the Tk thread
+        try:
+            with Image.open(path) as im:
+                _jpeg_draft(im, (size, size))
+                # PhotoImage takes L directly; converting it would just triple the
+                # pixels thumbnail() has to touch. P is resized with NEAREST, so
+                # palette images go to RGB(A) first or the thumb comes out aliased.
+                if im.mode == "P":
+                    im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+                elif im.mode not in ("RGB", "RGBA", "L"):
+                    im = im.convert("RGB")
+                im.thumbnail((size, size), resample_for((size, size)))
+            return im
         except Exception:
             return None
+
+    def _decode_ref_thumb_job(self, key):
+        im = self._decode_ref_thumb(*key)
+        try:
+            self.root.after(0, self._finish_ref_thumb, key, im)
+        except Exception:
+            pass
+
+    def _finish_ref_thumb(self, key, im):
+        widgets = self._thumb_inflight.pop(key, [])
+        ph = self._install_thumb(key, im) if im is not None else None
+        if ph is None:
+            # not cached, so the next render of this label tries the file again
+            self.gui_log(f"⚠️ Could not load reference thumbnail: {key[0]}")
+            ph = self._thumb_placeholder(int(key[1]), broken=True)
+        for w in widgets:
+            try:
+                if w.winfo_exists():
+                    w.configure(image=ph); w.image = ph
+            except Exception:
+                pass
+
+    def _install_thumb(self, key, im):
+        try:
+            # actual thumb dims, not the square bound: portrait/landscape thumbs
+            # are much smaller than size*size and would otherwise evict early
+            w, h = im.size
+            est = w * h * 4
+            ph = ImageTk.PhotoImage(im)
+        except Exception:
+            return None
+        # insert and evict if necessary
+        self._thumb_cache[key] = (ph, est)
+        self._thumb_cache_est_bytes += est
+        self._evict_cache_if_needed()
+        return ph
     # ------------------------------------------------
     def _maybe_purge_cache_on_zoom(self, target: str, old_size: int, new_size: int):
         """
@@ -2017,15 +2989,11 @@ class ImageRangerGUI:
             if not big_jump or not self._thumb_cache:
                 return
     
-            # rebuild cache keeping only thumbs of the new size
-            keep = OrderedDict()
-            est_bytes = 0
-            for (p, sz), (img, est) in self._thumb_cache.items():
-                if sz == int(new_size):
-                    keep[(p, sz)] = (img, est)
-                    est_bytes += est
-            self._thumb_cache = keep
-            self._thumb_cache_est_bytes = est_bytes
+            # drop thumbs of other sizes in place (LRU order of the rest is kept)
+            new_size = int(new_size)
+            cache = self._thumb_cache
+            for key in [k for k in cache if k[1] != new_size]:
+                self._thumb_cache_est_bytes -= cache.pop(key)[1]
         except Exception:
             pass
 
@@ -2033,12 +3001,22 @@ class ImageRangerGUI:
     def toggle_select(self, idx: int):
         if idx in self.selected_indices: self.selected_indices.remove(idx)
         else: self.selected_indices.add(idx)
+        self._paint_cell_sel(idx)
+        self.set_status_right(len(self.current_images), len(self.selected_indices))
+
+    def _cell_sel_style(self, selected: bool) -> dict:
+        if selected:
+            return {"outline": SETTINGS["main_grid_sel_color"],
+                    "width": int(SETTINGS["main_grid_sel_border"])}
+        return {"outline": "#2a2a2a", "width": 2}
+
+    def _paint_cell_sel(self, idx: int):
+        # O(1) canvas attribute change; no widget restyle or reflow
         try:
-            frame = self.thumb_buttons[idx]
-            frame.config(highlightbackground="#69a7ff" if idx in self.selected_indices else "#2a2a2a")
+            self.canvas.itemconfigure(self._cell_rects[idx],
+                                      **self._cell_sel_style(idx in self.selected_indices))
         except Exception:
             pass
-        self.set_status_right(len(self.current_images), len(self.selected_indices))
 
     # ----------------One slider → active grid-------------------------------
     def set_zoom_target(self, target: str):
@@ -2058,7 +3036,16 @@ class ImageRangerGUI:
         self.set_status_left(f"Zoom target: {'Main Grid' if target=='main' else 'Reference Strip'}")
     
     def on_zoom_change(self, value: int):
-        value = max(self.zoom_min, min(self.zoom_max, int(value)))
+        # the Scale fires on every drag step; apply only the last value
+        self._zoom_pending_value = value
+        if self._zoom_after_id is not None:
+            try: self.root.after_cancel(self._zoom_after_id)
+            except Exception: pass
+        self._zoom_after_id = self.root.after(120, self._apply_zoom)
+    
+    def _apply_zoom(self):
+        self._zoom_after_id = None
+        value = _snap_thumb_size(int(self._zoom_pending_value), self.zoom_min, self.zoom_max)
         if self.active_zoom_target.get() == "main":
             old = self._last_main_zoom
             if value != self.main_thumb_size.get():
@@ -2099,16 +3086,10 @@ class ImageRangerGUI:
             return
         try:
             # remove all references of this label from DB
-            from reference_db import get_all_references, delete_reference
-            refs = [r["path"] for r in get_all_references() if r["label"] == label]
-            for p in refs:
-                try:
-                   delete_reference(p)
-                except Exception:
-                   pass
+            # one transaction for all rows instead of a round-trip per ref
+            delete_references_bulk(list(_cached_refs_by_label().get(label, ())))
             # optional: clear threshold if your DB supports it
             try:
-                from reference_db import set_threshold_for_label
                 set_threshold_for_label(label, None)
             except Exception:
                 pass
@@ -2119,7 +3100,11 @@ class ImageRangerGUI:
 
     
     # ---------------- modal confirm ----------------
-    def _confirm_modal(self, title: str, message: str) -> bool:
+    def _confirm_modal(self, title: str, message: str, on_result):
+        """
+        Yes/No dialog that returns immediately; on_result(bool) runs once the
+        user answers (or closes it). No nested wait_window loop.
+        """
         dlg = tk.Toplevel(self.root)
         dlg.title(title)
         dlg.resizable(False, False)
@@ -2128,24 +3113,25 @@ class ImageRangerGUI:
         frm = ttk.Frame(dlg, padding=12)
         frm.pack(fill=tk.BOTH, expand=True)
         ttk.Label(frm, text=message, wraplength=380, justify="left").grid(row=0, column=0, columnspan=2, pady=(0, 10))
-        result = {"ok": False}
-        def on_yes():
-            result["ok"] = True
+        answered = []
+        def _finish(ok):
+            if answered:
+                return
+            answered.append(ok)
+            try: dlg.grab_release()
+            except Exception: pass
             dlg.destroy()
+            on_result(ok)
+        def on_yes():
+            _finish(True)
         def on_no():
-            result["ok"] = False
-            dlg.destroy()
+            _finish(False)
         ttk.Button(frm, text="Cancel", command=on_no).grid(row=1, column=0, sticky="e", padx=(0, 6))
         ttk.Button(frm, text="Stop", command=on_yes).grid(row=1, column=1, sticky="w")
         dlg.bind("<Return>", lambda e: on_yes())
         dlg.bind("<Escape>", lambda e: on_no())
-        dlg.update_idletasks()
-        x = self.root.winfo_rootx(); y = self.root.winfo_rooty()
-        w = self.root.winfo_width(); h = self.root.winfo_height()
-        ww = dlg.winfo_reqwidth(); wh = dlg.winfo_reqheight()
-        dlg.geometry(f"+{x + (w//2 - ww//2)}+{y + (h//2 - wh//2)}")
-        self.root.wait_window(dlg)
-        return result["ok"]
+        dlg.protocol("WM_DELETE_WINDOW", on_no)
+        _center_window(dlg, (280, 100), over=self.root)
     
     # --------------- inside class ImageRangerGUI ----------------
 
@@ -2178,6 +3164,7 @@ class ImageRangerGUI:
                     label = data.get("label")
                     entries = data.get("items", [])
                     restored = 0
+                    made = set()  # parent dirs already ensured this pass
                     for e in entries:
                         # accept both legacy {"trashed": "..."} and new {"backup_path": "...", "original_path": "..."}
                         backup = e.get("backup_path") or e.get("trashed")
@@ -2185,27 +3172,29 @@ class ImageRangerGUI:
                         if not backup or not orig:
                             continue
                         try:
-                            os.makedirs(os.path.dirname(orig), exist_ok=True)
-                            if os.path.exists(backup):
-                                shutil.move(backup, orig)
-                                if label:
-                                    try:
-                                        insert_reference(orig, label)
-                                    except Exception:
-                                        pass
-                                restored += 1
+                            d = os.path.dirname(orig)
+                            if d not in made:
+                                os.makedirs(d, exist_ok=True)
+                                made.add(d)
+                            file_ops.move_path(backup, orig)
+                            if label:
+                                try:
+                                    insert_reference(orig, label)
+                                except Exception:
+                                    pass
+                            restored += 1
+                        except FileNotFoundError:
+                            pass  # backup already gone; nothing to restore
                         except Exception as ex:
                             self.gui_log(f"Undo restore failed for {orig}: {ex}")
 
-                    if label:
-                        try:
-                            _write_or_refresh_metadata(label)
-                        except Exception:
-                            pass
+                    # nothing came back (e.g. backups gone after a crash): skip the
+                    # metadata rewrite and, above all, the embedding rebuild
+                    if label and restored:
+                        self.schedule_metadata_refresh(label)
                         # Refresh the UI + rebuild just this label's embeddings
-                        self.reference_browser.refresh_label_list(auto_select=False)
-                        if self.reference_browser.label_filter.get() == label:
-                            self.reference_browser.load_images()
+                        self.reference_browser.refresh(
+                            reload_images=(self.active_label.get() == label))
                         self.schedule_rebuild_embeddings(only_label=label)
 
                     self.gui_log(f"↩ Restored {restored} reference(s) to '{label}'.")
@@ -2236,19 +3225,14 @@ class ImageRangerGUI:
                             pass
 
                         os.makedirs(os.path.dirname(dest_folder), exist_ok=True)
-                        shutil.move(trashed_folder, dest_folder)
+                        file_ops.restore_folder(trashed_folder, dest_folder)
 
                         # Reinsert entries to DB
-                        restored = 0
-                        for root_dir, _, files in os.walk(dest_folder):
-                            for f in files:
-                                if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp")):
-                                    full = os.path.join(root_dir, f)
-                                    try:
-                                        insert_reference(full, label)
-                                        restored += 1
-                                    except Exception:
-                                        pass
+                        try:
+                            restored = insert_references_bulk(
+                                [(full, label) for full in _iter_image_files(dest_folder)])
+                        except Exception:
+                            restored = 0
 
                         # restore label metadata / threshold
                         try:
@@ -2259,9 +3243,7 @@ class ImageRangerGUI:
                             pass
 
                         # UI & embeddings
-                        self.reference_browser.refresh_label_list(auto_select=False)
-                        self.reference_browser.label_filter.set(label)
-                        self.reference_browser.load_images()
+                        self.reference_browser.refresh(label=label, reload_images=True)
                         self.schedule_rebuild_embeddings(only_label=label)
                         self.gui_log(f"↩ Restored label '{label}' ({restored} items).")
                     except Exception as ex:
@@ -2312,22 +3294,12 @@ class ImageRangerGUI:
 
     # ---------------- image grid ----------------
     def load_images_recursive(self, folder):
-        self.image_paths = []
-        exts = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
-        for root_dir, _, files in os.walk(folder):
-            for f in files:
-                if f.lower().endswith(exts):
-                    self.image_paths.append(os.path.join(root_dir, f))
+        self.image_paths = list(_iter_image_files(folder))
         self.gui_log(f"🖼️ Found {len(self.image_paths)} images. Rendering grid…")
         self.display_thumbnails()
 
     def display_thumbnails(self):
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        self.thumbnails.clear()
-        gc.collect()
-        self._start_thumb_job(self.image_paths)
-        # (the old eager loader is left out intentionally)
+        self.render_grid(list(self.image_paths))
 
     # ---------------- label flows ----------------
     def label_selected(self):
@@ -2339,20 +3311,20 @@ class ImageRangerGUI:
         if not dlg.result:
             return
         label, threshold = dlg.result
-        for path in self.selected_images:
-            dst = _safe_copy_to_label_folder(path, label, keep_original_name=True)
-            insert_reference(dst, label)
+        copied, failed = _copy_to_label_folder_many(sorted(self.selected_images), label)
+        for src, err in failed:
+            self.gui_log(f"❌ Could not copy {src} to '{label}': {err}")
+        insert_references_bulk([(dst, label) for dst in copied])
         set_threshold_for_label(label, threshold)
         default_folder = get_label_folder_path(label)
         os.makedirs(default_folder, exist_ok=True)
         insert_or_update_label(label, default_folder, threshold)
         _write_or_refresh_metadata(label, threshold)
-        messagebox.showinfo("Saved", f"{len(self.selected_images)} images labeled as '{label}'")
+        messagebox.showinfo("Saved", f"{len(copied)} images labeled as '{label}'")
         self.selected_images.clear()
-        self.display_thumbnails()
-        self.reference_browser.refresh_label_list()
-        self.reference_browser.label_filter.set(label)
-        self.reference_browser.load_images()
+        # let the dialog dismiss first; the grid redraws on the next idle tick
+        self.root.after_idle(self.display_thumbnails)
+        self.reference_browser.refresh(label=label, reload_images=True)
         self.gui_log(f"🏷️ Labeled images as '{label}' (threshold {threshold}). Rebuilding embeddings…")
         self.schedule_rebuild_embeddings(only_label=label)
 
@@ -2361,6 +3333,7 @@ class ImageRangerGUI:
             messagebox.showwarning("No Selection", "Select photos in the main grid first.")
             return
         current_label = self.reference_browser.label_filter.get()
+        shown = current_label  # the browser keeps showing this label throughout
         if not current_label:
             dlg = CreateLabelDialog(self.root, initial_name="", initial_threshold=0.3)
             self.root.wait_window(dlg)
@@ -2372,39 +3345,33 @@ class ImageRangerGUI:
             set_threshold_for_label(current_label, thr)
             insert_or_update_label(current_label, default_folder, thr)
             _write_or_refresh_metadata(current_label, thr)
-        for p in self.selected_images:
-            dst = _safe_copy_to_label_folder(p, current_label, keep_original_name=True)
-            insert_reference(dst, current_label)
-        _write_or_refresh_metadata(current_label)
-        self.gui_log(f"➕ Added {len(self.selected_images)} image(s) to reference label '{current_label}'. Rebuilding embeddings…")
-        messagebox.showinfo("Reference", f"Added {len(self.selected_images)} image(s) to '{current_label}'.")
+        copied, failed = _copy_to_label_folder_many(sorted(self.selected_images), current_label)
+        for src, err in failed:
+            self.gui_log(f"❌ Could not copy {src} to '{current_label}': {err}")
+        insert_references_bulk([(dst, current_label) for dst in copied])
+        self.schedule_metadata_refresh(current_label)
+        self.gui_log(f"➕ Added {len(copied)} image(s) to reference label '{current_label}'. Rebuilding embeddings…")
+        messagebox.showinfo("Reference", f"Added {len(copied)} image(s) to '{current_label}'.")
         self.selected_images.clear()
-        self.display_thumbnails()
-        self.reference_browser.refresh_label_list(auto_select=False)
-        if self.reference_browser.label_filter.get() == current_label:
-            self.reference_browser.load_images()
-        self.rebuild_embeddings_async(only_label=current_label)
+        # let the dialog dismiss first; the grid redraws on the next idle tick
+        self.root.after_idle(self.display_thumbnails)
+        self.reference_browser.refresh(reload_images=(shown == current_label))
+        self.schedule_rebuild_embeddings(only_label=current_label)
 
     # ---------------- sorting flow ----------------
     def start_sort_flow(self):
-        ref_list = get_all_references()
-        if not ref_list:
+        if not _has_references():
             messagebox.showwarning("No References", "Please label reference images first.")
             return
         model_dir = os.path.join(os.path.dirname(__file__), "buffalo_l")
         def log_callback(msg):
             self.gui_log(msg)
-        self.gui_log("⚙️ Building reference embeddings…")
-        try:
-            build_reference_embeddings_from_db(DB_PATH, model_dir, log_callback)
-        except Exception as e:
-            messagebox.showerror("Embeddings", f"Failed to build embeddings: {e}")
-            return
         progress = _ModalProgress(self.root, title="Building Embeddings", message="Preparing reference embeddings…")
         ok_holder = {"ok": True, "err": None}
         def _prebuild():
             try:
                 self.gui_log("⚙️ Preparing reference embeddings…")
+                from photo_sorter import build_reference_embeddings_from_db
                 build_reference_embeddings_from_db(DB_PATH, model_dir, log_callback)
             except Exception as e:
                 ok_holder["ok"] = False
@@ -2416,12 +3383,17 @@ class ImageRangerGUI:
         if not ok_holder["ok"]:
             messagebox.showerror("Embeddings", f"Failed to build embeddings: {ok_holder['err']}")
             return
-        inbox = filedialog.askdirectory(title="Select Inbox Folder to Sort")
+        home = os.path.expanduser("~")
+        inbox = filedialog.askdirectory(title="Select Inbox Folder to Sort",
+                                        initialdir=SETTINGS.get("last_inbox_dir") or home)
         if not inbox:
             return
-        output = filedialog.askdirectory(title="Select Output Folder for Sorted Photos")
+        output = filedialog.askdirectory(title="Select Output Folder for Sorted Photos",
+                                         initialdir=SETTINGS.get("last_output_dir") or home)
         if not output:
             return
+        SETTINGS["last_inbox_dir"], SETTINGS["last_output_dir"] = inbox, output
+        self._schedule_settings_save()
         unmatched = os.path.join(output, "_unmatched")
         match_mode = self.multi_face_mode.get()
         self.sort_stop_event = threading.Event()
@@ -2429,6 +3401,7 @@ class ImageRangerGUI:
         def worker():
             try:
                 self.gui_log(f"🚀 Sorting started → mode: {match_mode}")
+                from photo_sorter import sort_photos_with_embeddings_from_folder_using_db
                 sort_photos_with_embeddings_from_folder_using_db(
                     inbox_dir=inbox,
                     output_dir=output,
@@ -2479,18 +3452,24 @@ class ImageRangerGUI:
         if not path:
             return
         try:
-            import csv, sqlite3
+            import sqlite3
             conn = sqlite3.connect(DB_PATH)
-            cur = conn.cursor()
-            cur.execute("""SELECT id, filename, matched_label, confidence, match_mode, timestamp
-                           FROM match_audit ORDER BY id""")
-            rows = cur.fetchall()
-            conn.close()
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                w = csv.writer(f)
-                w.writerow(["id","filename","matched_label","confidence","match_mode","timestamp"])
-                w.writerows(rows)
-            messagebox.showinfo("Export", f"Exported {len(rows)} rows to:\n{path}")
+            count = 0
+            try:
+                conn.execute("PRAGMA cache_size=-65536")  # 64 MB page cache for the scan
+                cur = conn.cursor()
+                cur.arraysize = 1000
+                # ORDER BY id walks the primary key, so no sort step; stream in batches
+                cur.execute("""SELECT id, filename, matched_label, confidence, match_mode, timestamp
+                               FROM match_audit ORDER BY id""")
+                with open(path, "wb", buffering=1 << 20) as f:
+                    f.write(b"id,filename,matched_label,confidence,match_mode,timestamp\r\n")
+                    for batch in iter(cur.fetchmany, []):
+                        f.write("".join(map(file_ops.csv_line, batch)).encode("utf-8"))
+                        count += len(batch)
+            finally:
+                conn.close()
+            messagebox.showinfo("Export", f"Exported {count} rows to:\n{path}")
             self.gui_log(f"📤 Exported match audit to {path}")
         except Exception as e:
             messagebox.showerror("Export", f"Failed to export: {e}")
@@ -2511,14 +3490,18 @@ class ImageRangerGUI:
         if not self.sorting:
             self.start_sort_flow()
         else:
-            if self._confirm_modal("Stop Sorting", "Are you sure you want to stop sorting?"):
+            def _answer(ok):
+                if not ok or not self.sorting:
+                    return
                 if self.sort_stop_event:
                     self.sort_stop_event.set()
                 self._set_sort_stopping()
+            self._confirm_modal("Stop Sorting", "Are you sure you want to stop sorting?", _answer)
 
 # -----------------------------------------------------------
 
 if __name__ == '__main__':
+    _init_database()
     root = tk.Tk()
     app = ImageRangerGUI(root)
     root.mainloop()
@@ -5,8 +5,19 @@ import cv2
 import numpy as np
 import shutil
 import uuid
+import mmap
+import hashlib
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from insightface.app import FaceAnalysis
-from sklearn.metrics.pairwise import cosine_similarity
+try:
+    from insightface.utils import face_align
+except Exception:  # pragma: no cover
+    face_align = None
+from utils_numba import score_batch
+from file_ops import fast_copy
 from reference_db import (
     get_all_references,
     log_match_result,
@@ -17,23 +28,91 @@ from reference_db import (
 # Global cache
 ref_embeddings = {}
 
+# Stacked view of ref_embeddings for identify_faces(); rebuilt by _refresh_ref_matrix()
+_ref_labels = []                                   # row i of _ref_matrix belongs to _ref_labels[i]
+_ref_matrix = np.zeros((0, 512), dtype=np.float32) # [K, D], rows L2-normalized
+_ref_thresholds = np.zeros(0, dtype=np.float32)    # [K] per-label match threshold
+_threshold_cache = {}                              # label -> threshold; one DB read per label per rebuild
+
+
+def _l2_normalize(m):
+    """Row-wise L2 normalization; all-zero rows stay zero instead of turning into NaN."""
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def _invalidate_threshold_cache():
+    _threshold_cache.clear()
+
+
+def _threshold_for(label):
+    thr = _threshold_cache.get(label)
+    if thr is None:
+        try:
+            thr = float(get_threshold_for_label(label))
+        except Exception:
+            thr = 0.3
+        _threshold_cache[label] = thr
+    return thr
+
+
+def _refresh_ref_thresholds():
+    """Re-read thresholds for the stacked labels (they can change without a rebuild)."""
+    global _ref_thresholds
+    _invalidate_threshold_cache()
+    _ref_thresholds = np.asarray([_threshold_for(l) for l in _ref_labels], dtype=np.float32)
+
+
+def _mean_of_image_means(groups):
+    """
+    Label embedding = mean over reference images of each image's mean face,
+    L2-normalized so scoring against it is a plain dot product.
+    `groups` holds one [faces, D] array per image; both levels of averaging
+    run as a single reduceat pass over the concatenated faces.
+    """
+    counts = np.fromiter((len(g) for g in groups), dtype=np.int64, count=len(groups))
+    arr = np.concatenate(groups).astype(np.float32, copy=False)
+    starts = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    per_image = np.add.reduceat(arr, starts, axis=0) / counts[:, None]
+    mean = per_image.mean(axis=0)
+    mean /= np.linalg.norm(mean) + 1e-12
+    return mean
+
+
+def _refresh_ref_matrix():
+    """Restack ref_embeddings (and their thresholds) after any rebuild."""
+    global _ref_labels, _ref_matrix, _ref_thresholds
+    labels = list(ref_embeddings)
+    if not labels:
+        _ref_labels = []
+        _ref_matrix = np.zeros((0, 512), dtype=np.float32)
+        _ref_thresholds = np.zeros(0, dtype=np.float32)
+        return
+    # rows are unit vectors already (_mean_of_image_means normalizes at build time).
+    # Kept float32 on purpose: numpy has no half-precision BLAS, so an fp16
+    # matrix would turn the scoring GEMM into a much slower generic loop.
+    _ref_matrix = np.stack([ref_embeddings[l] for l in labels]).astype(np.float32, copy=False)
+    _ref_thresholds = np.asarray([_threshold_for(l) for l in labels], dtype=np.float32)
+    _ref_labels = labels
+
 # ---- Global model cache (loaded once per process) --------------
 
 _MODEL_CACHE = {
-    "dir": None,
+    "dir": None,         # model_dir exactly as the caller passed it (pre-normpath)
     "app": None,         # cached FaceAnalysis instance
     "model_dir": None,   # path it was built from
     "providers": None,   # ORT providers used
 }
+# Replaced wholesale (never mutated) so lock-free readers always see one
+# consistent entry; the lock only serializes (re)initialization.
+_MODEL_LOCK = threading.Lock()
+_AUTO_PROVIDERS = None  # onnxruntime's provider pick, probed once per process
 
 def load_model_cached(model_dir, log_callback):
     """Return cached FaceAnalysis if model_dir matches; else load once and cache."""
-    global _model_cache
-    if _model_cache["app"] is not None and _model_cache["dir"] == model_dir:
-        return _model_cache["app"]
-    app = load_model(model_dir, log_callback)
-    _model_cache = {"dir": model_dir, "app": app}
-    return app
+    return get_buffalo_model(model_dir, log_callback=log_callback)
 
 def build_reference_embeddings_for_label(db_path, model_dir, label, log_callback):
     """
@@ -41,6 +120,7 @@ def build_reference_embeddings_for_label(db_path, model_dir, label, log_callback
     - If that label has no references, it will be removed from the in-memory map.
     """
     global ref_embeddings
+    _invalidate_threshold_cache()
 
     app = load_model_cached(model_dir, log_callback)
     if app is None:
@@ -56,33 +136,32 @@ def build_reference_embeddings_for_label(db_path, model_dir, label, log_callback
         # no refs -> drop from cache
         if label in ref_embeddings:
             ref_embeddings.pop(label, None)
+            _refresh_ref_matrix()
             log_callback(f"ℹ️ No refs for '{label}'. Removed from cache.")
         return
 
-    vecs = []
-    for _ref_id, _lbl, img_path in references:
-        if not os.path.isfile(img_path):
-            log_callback(f"⚠️ Missing reference file, skipping: {img_path}")
-            continue
-        try:
-            img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR)
-            if img is None:
-                raise ValueError("Image not readable")
-            faces = app.get(img)
-            if not faces:
-                log_callback(f"⚠️ No face found in reference: {img_path}")
-                continue
-            embeddings = [f.embedding for f in faces]
-            vecs.append(np.mean(embeddings, axis=0))
-        except Exception as e:
-            log_callback(f"❌ Error processing {img_path}: {e}")
+    paths = [r[2] for r in references]
+    vecs = [emb for _i, _p, emb in _embed_reference_images(app, paths, log_callback, db_path)]
 
     if vecs:
-        ref_embeddings[label] = np.mean(vecs, axis=0)
+        ref_embeddings[label] = _mean_of_image_means(vecs)
         log_callback(f"✅ Rebuilt embeddings for '{label}' using {len(vecs)} reference image(s).")
     else:
         ref_embeddings.pop(label, None)
         log_callback(f"⚠️ No valid embeddings for '{label}'. Cache cleared.")
+    _refresh_ref_matrix()
+
+
+def _auto_providers():
+    global _AUTO_PROVIDERS
+    if _AUTO_PROVIDERS is None:
+        try:
+            import onnxruntime as ort
+            avail = ort.get_available_providers()
+        except Exception:
+            avail = ["CPUExecutionProvider"]
+        _AUTO_PROVIDERS = ("CUDAExecutionProvider",) if "CUDAExecutionProvider" in avail else ("CPUExecutionProvider",)
+    return _AUTO_PROVIDERS
 
 
 def get_buffalo_model(model_dir, providers=None, log_callback=print):
@@ -91,39 +170,102 @@ def get_buffalo_model(model_dir, providers=None, log_callback=print):
     - Detects available onnxruntime providers (CPU/GPU) if not specified.
     - Prepares once with det_size=(640,640).
     - Reuses the same object for future calls (same model_dir/providers).
+    - Safe to call from several threads; only one of them loads.
     """
     global _MODEL_CACHE
 
-    # Normalize args
-    model_dir = os.path.normpath(model_dir)
+    providers = _auto_providers() if providers is None else tuple(providers)
+
+    # Same arguments as last time: no path normalization, no lock
+    entry = _MODEL_CACHE
+    if entry["app"] is not None and entry["dir"] == model_dir and entry["providers"] == providers:
+        return entry["app"]
+
+    with _MODEL_LOCK:
+        entry = _MODEL_CACHE
+        norm_dir = os.path.normpath(model_dir)
+        if entry["app"] is not None and entry["model_dir"] == norm_dir and entry["providers"] == providers:
+            _MODEL_CACHE = dict(entry, dir=model_dir)
+            return entry["app"]
+
+        # (Re)initialize
+        app = _init_your_existing_buffalo(norm_dir, list(providers), log_callback)
+        if app is None:
+            return None
+        _MODEL_CACHE = {
+            "dir": model_dir,
+            "app": app,
+            "model_dir": norm_dir,
+            "providers": providers,
+        }
+        return app
+
+
+def _variant_model_file(model_file, variant):
+    """
+    Where the "int8"/"fp16" copy of `model_file` lives (see download_models.sh).
+    It sits in a subfolder because FaceAnalysis loads every *.onnx in the pack folder.
+    The script only installs copies whose embeddings stay within 1e-3 cosine of
+    FP32 (they share the per-label thresholds) and, for INT8, that run faster.
+    """
+    return os.path.join(os.path.dirname(model_file), variant, os.path.basename(model_file))
+
+
+def _model_variant(task, providers):
+    """Which converted copy a model should run from, if one exists."""
+    if providers == ["CPUExecutionProvider"]:
+        return "int8" if task == "recognition" else None  # detection stays FP32 for recall
+    if "CUDAExecutionProvider" in providers and task in ("detection", "recognition"):
+        return "fp16"  # tensor cores; inputs/outputs stay float32
+    return None
+
 
-    # Auto-detect providers if not given
-    if providers is None:
+_TUNED_TASKS = ("detection", "recognition")  # the only heads sorting runs
+
+
+def _tune_sessions(app, providers, log_callback=print):
+    """
+    Re-create the detection and recognition sessions with tuned SessionOptions
+    (insightface's model_zoo only forwards providers, not session options).
+    One forward pass at a time runs per process, so ORT gets half the cores
+    (the decode pool has the rest) and no inter-op pool; on CUDA, heuristic
+    conv algo search avoids the exhaustive benchmark on every new input shape.
+    On CPU the recognition model runs from its INT8 copy, on CUDA detection
+    and recognition run from FP16 copies, whenever those exist. Models keep their default session when anything
+    here fails.
+    """
+    try:
+        import onnxruntime as ort
+    except Exception:
+        return
+    so = ort.SessionOptions()
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.enable_mem_pattern = True
+    so.enable_cpu_mem_arena = True
+    so.intra_op_num_threads = max(1, (os.cpu_count() or 2) // 2)
+    so.inter_op_num_threads = 1
+    providers = list(providers or ["CPUExecutionProvider"])
+    options = [{"cudnn_conv_algo_search": "HEURISTIC", "arena_extend_strategy": "kSameAsRequested"}
+               if p == "CUDAExecutionProvider" else {} for p in providers]
+    for task, model in getattr(app, "models", {}).items():
+        if task not in _TUNED_TASKS:
+            continue  # landmark/genderage heads: sorting never runs them, don't load twice
+        model_file = getattr(model, "model_file", None)
+        if not model_file or getattr(model, "session", None) is None:
+            continue
+        variant = _model_variant(task, providers)
+        if variant:
+            converted = _variant_model_file(model_file, variant)
+            if os.path.isfile(converted):
+                model_file = converted
+                log_callback(f"⚡ Using {variant.upper()} {task} model: {converted}")
         try:
-            import onnxruntime as ort
-            avail = ort.get_available_providers()
-        except Exception:
-            avail = ["CPUExecutionProvider"]
-        providers = ["CUDAExecutionProvider"] if "CUDAExecutionProvider" in avail else ["CPUExecutionProvider"]
-
-    # If already cached with same settings, reuse
-    if (
-        _MODEL_CACHE["app"] is not None and
-        _MODEL_CACHE["model_dir"] == model_dir and
-        _MODEL_CACHE["providers"] == tuple(providers)
-    ):
-        return _MODEL_CACHE["app"]
-
-    # (Re)initialize
-    app = _init_your_existing_buffalo(model_dir, providers, log_callback)
-    if app is None:
-        return None
-    _MODEL_CACHE.update({
-        "app": app,
-        "model_dir": model_dir,
-        "providers": tuple(providers),
-    })
-    return app
+            model.session = ort.InferenceSession(model_file, sess_options=so,
+                                                 providers=providers, provider_options=options)
+            model.session_file = model_file  # FP32/FP16/INT8; part of the reference embedding cache key
+        except Exception as e:
+            log_callback(f"⚠️ Default ORT session kept for {os.path.basename(model_file)}: {e}")
 
 
 def _init_your_existing_buffalo(model_dir, providers, log_callback=print):
@@ -150,7 +292,11 @@ def _init_your_existing_buffalo(model_dir, providers, log_callback=print):
         # choose CPU/GPU via ctx_id; older insightface will still honor this
         use_cuda = (isinstance(providers, (list, tuple)) and "CUDAExecutionProvider" in providers)
         ctx_id = 0 if use_cuda else -1
+        if used_providers:
+            _tune_sessions(app, used_providers, log_callback)
         app.prepare(ctx_id=ctx_id, det_size=(640, 640))
+        if use_cuda:
+            _warm_up(app, log_callback)
         return app
         
 #        model_path = os.path.join(model_dir, "buffalo_l")
@@ -171,41 +317,422 @@ def _init_your_existing_buffalo(model_dir, providers, log_callback=print):
         return None
 
 
+def _warm_up(app, log_callback=print):
+    """
+    One throwaway forward pass per model so CUDA context setup and cuDNN algo
+    search happen here, not on the first real photo. The detector always runs
+    at det_size, so a single input size covers it; a blank frame has no faces,
+    so recognition gets a blank crop of its own.
+    """
+    try:
+        app.get(np.zeros((640, 640, 3), dtype=np.uint8))
+        rec = getattr(app, "models", {}).get("recognition")
+        if rec is not None and hasattr(rec, "get_feat"):
+            w, h = rec.input_size
+            rec.get_feat([np.zeros((h, w, 3), dtype=np.uint8)])
+    except Exception as e:
+        log_callback(f"⚠️ GPU warm-up skipped: {e}")
+
+
+_dir_listings = {}                  # folder -> names present or handed out this run
+_dir_listings_lock = threading.Lock()
+
+
+def _reset_dir_listings():
+    """Forget cached folder listings (start of a run; folders may have changed since)."""
+    with _dir_listings_lock:
+        _dir_listings.clear()
+
+
 def _build_safe_destination(out_folder, filename, keep_original_filenames=True):
     """
     Returns a destination path inside out_folder that does not overwrite existing files.
     If keep_original_filenames=True -> keep name, add _2, _3... on collision.
     Otherwise -> prefix an 8-char uuid.
+    Collisions are probed against a cached listing of the folder (one listdir per
+    folder per run) and the returned name is reserved in it.
     """
-    os.makedirs(out_folder, exist_ok=True)
-    name, ext = os.path.splitext(filename)
-
     if not keep_original_filenames:
+        os.makedirs(out_folder, exist_ok=True)
         return os.path.join(out_folder, f"{uuid.uuid4().hex[:8]}_{filename}")
 
-    candidate = os.path.join(out_folder, filename)
-    if not os.path.exists(candidate):
-        return candidate
+    name, ext = os.path.splitext(filename)
+    with _dir_listings_lock:
+        taken = _dir_listings.get(out_folder)
+        if taken is None:
+            os.makedirs(out_folder, exist_ok=True)
+            taken = _dir_listings[out_folder] = set(os.listdir(out_folder))
+
+        candidate, i = filename, 2
+        while True:
+            if candidate not in taken:
+                path = os.path.join(out_folder, candidate)
+                # one stat guards against files that appeared since the listing
+                if not os.path.exists(path):
+                    taken.add(candidate)
+                    return path
+                taken.add(candidate)
+            candidate = f"{name}_{i}{ext}"
+            i += 1
+
+
+_INBOX_EXTS = frozenset({"jpg", "jpeg", "png", "bmp", "webp"})  # lowercase, no dot
+_DECODE_WORKERS = 4  # inbox decode threads (cv2.imdecode releases the GIL)
+_DECODE_AHEAD = 8    # decoded images held ahead of inference; caps RAM
+_EMBED_BATCH = 16    # images whose faces share one recognition session.run
+VERBOSE_LOG = False  # per-file "moved/copied/embedded" lines during bulk runs
+_PROGRESS_EVERY = 200  # images between progress lines when not verbose
+
+
+class _Logger:
+    """
+    Wraps a log_callback. Calling it always logs (warnings, errors, summaries);
+    .detail() is the chatty per-file stream and only goes through when verbose.
+    """
+    def __init__(self, callback, verbose=VERBOSE_LOG):
+        self._callback = callback
+        self.verbose = verbose
+
+    def __call__(self, msg):
+        self._callback(msg)
+
+    def detail(self, msg):
+        if self.verbose:
+            self._callback(msg)
+
+
+def _log_detail(log_callback, msg):
+    """Per-file detail: dropped by a quiet _Logger, passed through for plain callbacks."""
+    detail = getattr(log_callback, "detail", None)
+    (detail or log_callback)(msg)
+
+
+_NVJPEG = {"checked": False, "decode": None}  # torchvision.io.decode_jpeg, resolved lazily
 
+
+def _nvjpeg_decoder():
+    """
+    torchvision's nvJPEG-backed decode_jpeg when torch sees a CUDA device, else None.
+    Resolved on first use so CPU-only runs never import torch.
+    """
+    if not _NVJPEG["checked"]:
+        _NVJPEG["checked"] = True
+        try:
+            import torch
+            from torchvision.io import decode_jpeg
+            if torch.cuda.is_available():
+                _NVJPEG["decode"] = decode_jpeg
+        except Exception:
+            pass
+    return _NVJPEG["decode"]
+
+
+def _decode_jpeg_cuda(data):
+    """Decode JPEG bytes on the GPU; returns a host BGR ndarray like cv2.imdecode, or None."""
+    decode = _nvjpeg_decoder()
+    if decode is None:
+        return None
+    import torch
+    try:
+        # EXIF rotation must match cv2.IMREAD_COLOR or detection sees sideways faces
+        rgb = decode(torch.from_numpy(data), device="cuda", apply_exif_orientation=True)
+    except TypeError:
+        _NVJPEG["decode"] = None  # torchvision too old to honor EXIF; stay on CPU
+        return None
+    except Exception:
+        return None  # CMYK/lossless/etc. → let OpenCV handle it
+    if rgb.shape[0] != 3:
+        return None
+    return rgb.permute(1, 2, 0).flip(-1).contiguous().cpu().numpy()
+
+
+_REDUCE_DECODE_ABOVE = 2560  # JPEG long side (px) from which we decode at half size
+_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}  # frame headers, not DHT/JPG/DAC
+
+
+def _jpeg_long_side(data):
+    """Longer pixel dimension from a JPEG's SOF header; 0 if not a JPEG or unparsable."""
+    buf = memoryview(data)
+    n = len(buf)
+    if n < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return 0
     i = 2
-    while True:
-        candidate = os.path.join(out_folder, f"{name}_{i}{ext}")
-        if not os.path.exists(candidate):
-            return candidate
-        i += 1
+    while i + 9 < n:
+        if buf[i] != 0xFF:
+            return 0
+        marker = buf[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # standalone markers
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            h = (buf[i + 5] << 8) | buf[i + 6]
+            w = (buf[i + 7] << 8) | buf[i + 8]
+            return max(h, w)
+        if marker == 0xDA:  # scan data before any frame header
+            return 0
+        i += 2 + ((buf[i + 2] << 8) | buf[i + 3])
+    return 0
+
+
+def _decode_buffer(data, path, use_gpu=False):
+    """Encoded bytes (uint8 array) → BGR ndarray, or None if nothing could decode it."""
+    img = None
+    if use_gpu and path.lower().endswith((".jpg", ".jpeg")):
+        img = _decode_jpeg_cuda(data)
+    if img is None:
+        # libjpeg scales in the DCT domain, so a half-size decode is ~4x cheaper;
+        # only used while the result stays >= 2x det_size so small faces keep detail
+        big = _jpeg_long_side(data) >= _REDUCE_DECODE_ABOVE
+        img = cv2.imdecode(data, cv2.IMREAD_REDUCED_COLOR_2 if big else cv2.IMREAD_COLOR)
+    return img
+
+
+def _load_inbox_image(path, use_gpu=False):
+    """
+    Read + decode one image (runs on the decode pool). The file is mapped
+    rather than read, so the decoder works straight from the page cache with
+    no intermediate bytes buffer. The walk already saw it as a file; if it
+    vanished since, open() raises FileNotFoundError.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # zero-length files can't be mapped
+            raise ValueError("Image unreadable")
+    try:
+        if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        img = _decode_buffer(np.frombuffer(mm, dtype=np.uint8), path, use_gpu)
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            pass  # a decoder still holds the view; the map goes when it does
+    if img is None:
+        raise ValueError("Image unreadable")
+    return img
+
+
+def _fast_path_models(app):
+    """
+    (det_model, rec_model) for detect → align → batched embed, or None when this
+    insightface build doesn't expose them (then callers use app.get per image).
+    """
+    det = getattr(app, "det_model", None)
+    rec = getattr(app, "models", {}).get("recognition")
+    if face_align is None or det is None or rec is None or not hasattr(rec, "get_feat"):
+        return None
+    return det, rec
+
+
+def _detect_aligned(det, rec, img):
+    """
+    Aligned face crops for `img`. Only detection runs here — FaceAnalysis.get
+    would also run the landmark/gender-age heads, which sorting never reads.
+    """
+    _bboxes, kpss = det.detect(img, max_num=0, metric="default")
+    if kpss is None or len(kpss) == 0:
+        return []
+    size = rec.input_size[0]
+    return [face_align.norm_crop(img, landmark=kps, image_size=size) for kps in kpss]
+
+
+def _embed_crops(rec, crops):
+    """All crops through the recognition model in one forward pass → [N, D]."""
+    if not crops:
+        return np.zeros((0, 512), dtype=np.float32)
+    try:
+        return np.asarray(rec.get_feat(crops), dtype=np.float32).reshape(len(crops), -1)
+    except Exception:
+        # model exported with a fixed batch of 1
+        return np.concatenate([np.asarray(rec.get_feat([c]), dtype=np.float32).reshape(1, -1)
+                               for c in crops])
+
+
+_REF_DECODE_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # reference rebuild decode threads
+
+
+_REF_CACHE_TABLE = "reference_embedding_cache"  # (sha1 of file bytes, model tag) → face embeddings
+
+
+def _file_sha1(path):
+    """SHA-1 of the file's bytes (hashed from a read-only map), or None if unreadable."""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.sha1(mm).hexdigest()
+    except (OSError, ValueError):
+        return None
+
+
+def _session_file_tag(model):
+    """basename:size of the file a model's session actually runs (FP32/FP16/INT8 differ in size)."""
+    path = getattr(model, "session_file", None) or getattr(model, "model_file", None)
+    if not path:
+        return None
+    try:
+        return f"{os.path.basename(path)}:{os.path.getsize(path)}"
+    except OSError:
+        return None
+
+
+def _embedding_pipeline_tag(app, use_gpu):
+    """
+    Identifies everything that shapes a cached embedding: the detection and
+    recognition sessions (crops come from the detector's landmarks), the
+    decoder (nvJPEG decodes full size, cv2 may decode at half size) and the
+    half-size decode rule. None if any part is unknown.
+    """
+    models = getattr(app, "models", {})
+    det = _session_file_tag(getattr(app, "det_model", None) or models.get("detection"))
+    rec = _session_file_tag(models.get("recognition"))
+    if det is None or rec is None:
+        return None
+    decoder = "nvjpeg" if use_gpu and _nvjpeg_decoder() is not None else "cv2"
+    return f"det={det};rec={rec};decode={decoder};reduce>={_REDUCE_DECODE_ABOVE}"
+
+
+def _open_ref_cache(db_path, log_callback):
+    try:
+        conn = sqlite3.connect(db_path, timeout=5)
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {_REF_CACHE_TABLE} ("
+            "sha1 TEXT NOT NULL, model TEXT NOT NULL, n_faces INTEGER NOT NULL, emb BLOB, "
+            "PRIMARY KEY (sha1, model))"
+        )
+        return conn
+    except Exception as e:
+        log_callback(f"⚠️ Embedding cache unavailable, embedding every reference: {e}")
+        return None
+
+
+def _cached_ref_embeddings(conn, tag, digests):
+    """{sha1: [n_faces, D] float32} for the digests already cached under `tag`."""
+    found = {}
+    wanted = list({d for d in digests if d})
+    for start in range(0, len(wanted), 500):  # stay under SQLite's host-parameter limit
+        chunk = wanted[start:start + 500]
+        rows = conn.execute(
+            f"SELECT sha1, n_faces, emb FROM {_REF_CACHE_TABLE} "
+            f"WHERE model = ? AND sha1 IN ({','.join('?' * len(chunk))})",
+            [tag, *chunk],
+        )
+        for sha1, n_faces, blob in rows:
+            if n_faces:
+                found[sha1] = np.frombuffer(blob, dtype=np.float32).reshape(n_faces, -1)
+            else:
+                found[sha1] = np.zeros((0, 512), dtype=np.float32)
+    return found
+
+
+def _embed_reference_images(app, paths, log_callback, db_path=None):
+    """
+    Yield (index, path, [n_faces, D] embeddings) for each reference image with a
+    face. With `db_path`, images whose bytes were embedded before by the same
+    model come from the reference_embedding_cache table (yielded first, no
+    decode); the rest are read + decoded ahead on a thread pool, in `paths`
+    order, while detection and recognition stay on the calling thread (one ORT
+    session user) and their results are written back to the cache.
+    Unreadable, missing and face-less files are logged and skipped.
+    """
+    cache = _open_ref_cache(db_path, log_callback) if db_path else None
+    use_gpu = "CUDAExecutionProvider" in (_MODEL_CACHE["providers"] or ())
+    tag = _embedding_pipeline_tag(app, use_gpu) if cache is not None else None
+    digests = [None] * len(paths)
+    hits = {}
+    fresh = []  # (sha1, tag, n_faces, blob) rows to write back
+    if tag is not None:
+        with ThreadPoolExecutor(max_workers=_REF_DECODE_WORKERS) as hasher:
+            digests = list(hasher.map(_file_sha1, paths))
+        try:
+            hits = _cached_ref_embeddings(cache, tag, digests)
+        except Exception as e:
+            log_callback(f"⚠️ Embedding cache lookup failed: {e}")
+
+    fast = _fast_path_models(app)
+    todo = iter([(i, p) for i, p in enumerate(paths) if digests[i] not in hits])
+    pending = deque()
+    pool = ThreadPoolExecutor(max_workers=_REF_DECODE_WORKERS)
+
+    def _fill():
+        while len(pending) < _REF_DECODE_WORKERS * 2:
+            nxt = next(todo, None)
+            if nxt is None:
+                return
+            pending.append((nxt, pool.submit(_load_inbox_image, nxt[1], use_gpu)))
+
+    try:
+        for i, img_path in enumerate(paths):
+            emb = hits.get(digests[i]) if digests[i] else None
+            if emb is None:
+                continue
+            if len(emb) == 0:
+                log_callback(f"⚠️ No face found in reference: {img_path}")
+                continue
+            yield i, img_path, emb
+
+        _fill()
+        while pending:
+            (i, img_path), fut = pending.popleft()
+            _fill()
+            try:
+                img = fut.result()
+            except FileNotFoundError:
+                log_callback(f"⚠️ Missing reference file, skipping: {img_path}")
+                continue
+            except Exception as e:
+                log_callback(f"❌ Error processing {img_path}: {e}")
+                continue
+            try:
+                if fast:
+                    emb = _embed_crops(fast[1], _detect_aligned(fast[0], fast[1], img))
+                else:
+                    faces = app.get(img)
+                    emb = (np.stack([f.embedding for f in faces]).astype(np.float32) if faces
+                           else np.zeros((0, 512), dtype=np.float32))
+            except Exception as e:
+                log_callback(f"❌ Error processing {img_path}: {e}")
+                continue
+            finally:
+                del img
+            if digests[i]:
+                fresh.append((digests[i], tag, len(emb), emb.tobytes()))
+            if len(emb) == 0:
+                log_callback(f"⚠️ No face found in reference: {img_path}")
+                continue
+            yield i, img_path, emb
+    finally:
+        for _p, fut in pending:
+            fut.cancel()
+        pool.shutdown(wait=True)
+        if cache is not None:
+            try:
+                if fresh:
+                    with cache:
+                        cache.executemany(
+                            f"INSERT OR REPLACE INTO {_REF_CACHE_TABLE} "
+                            "(sha1, model, n_faces, emb) VALUES (?, ?, ?, ?)",
+                            fresh,
+                        )
+            except Exception as e:
+                log_callback(f"⚠️ Could not update embedding cache: {e}")
+            finally:
+                cache.close()
 
 
 def _copy_one(src_path, dest_folder, filename, keep_original_filenames, log_callback):
     dst = _build_safe_destination(dest_folder, filename, keep_original_filenames)
-    shutil.copy2(src_path, dst)
-    log_callback(f"📄 Copied {os.path.basename(src_path)} → {dest_folder} as {os.path.basename(dst)}")
+    fast_copy(src_path, dst)
+    _log_detail(log_callback, f"📄 Copied {os.path.basename(src_path)} → {dest_folder} as {os.path.basename(dst)}")
     return dst
 
 
 def _move_one(src_path, dest_folder, filename, keep_original_filenames, log_callback):
     dst = _build_safe_destination(dest_folder, filename, keep_original_filenames)
     shutil.move(src_path, dst)
-    log_callback(f"📦 Moved {os.path.basename(dst)} into {dest_folder}")
+    _log_detail(log_callback, f"📦 Moved {os.path.basename(dst)} into {dest_folder}")
     return dst
 
 # ------------- OLD MODAL LOADING ----------------------
@@ -234,6 +761,7 @@ def build_reference_embeddings_for_labels(db_path, model_dir, labels, log_callba
     - Removes the label from ref_embeddings if it has no valid faces anymore.
     """
     global ref_embeddings
+    _invalidate_threshold_cache()
 
     # Clean dead paths (safe to run every time)
     try:
@@ -275,37 +803,27 @@ def build_reference_embeddings_for_labels(db_path, model_dir, labels, log_callba
             continue
 
         embeddings = []
-        for img_path in paths:
-            try:
-                if not os.path.isfile(img_path):
-                    log_callback(f"⚠️ Missing reference file, skipping: {img_path}")
-                    continue
-                img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR)
-                if img is None:
-                    raise ValueError("Image not readable")
-                faces = app.get(img)
-                if not faces:
-                    log_callback(f"⚠️ No face found in reference: {img_path}")
-                    continue
-                vecs = [f.embedding for f in faces]
-                embeddings.append(np.mean(vecs, axis=0))
-                log_callback(f"✔️ Embedded '{lbl}' from {img_path}")
-            except Exception as e:
-                log_callback(f"❌ Error processing {img_path}: {e}")
+        for _i, img_path, emb in _embed_reference_images(app, paths, log_callback, db_path):
+            embeddings.append(emb)
+            _log_detail(log_callback, f"✔️ Embedded '{lbl}' from {img_path}")
 
         if embeddings:
-            ref_embeddings[lbl] = np.mean(embeddings, axis=0)
+            ref_embeddings[lbl] = _mean_of_image_means(embeddings)
         else:
             if lbl in ref_embeddings:
                 del ref_embeddings[lbl]
             log_callback(f"⚠️ '{lbl}': no valid embeddings after rebuild.")
 
+    _refresh_ref_matrix()
+
 def build_reference_embeddings_from_db(db_path, model_dir, log_callback):
     """
     Full rebuild for ALL labels (Tools → Rebuild Embeddings).
     """
     global ref_embeddings
     ref_embeddings.clear()
+    _invalidate_threshold_cache()
+    _refresh_ref_matrix()
 
     # Clean dead paths
     try:
@@ -330,27 +848,17 @@ def build_reference_embeddings_from_db(db_path, model_dir, log_callback):
         return
 
     tmp = {}
-    for _id, label, img_path in references:
-        try:
-            if not os.path.isfile(img_path):
-                log_callback(f"⚠️ Missing reference file, skipping: {img_path}")
-                continue
-            img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR)
-            if img is None:
-                raise ValueError("Image not readable")
-            faces = app.get(img)
-            if not faces:
-                log_callback(f"⚠️ No face found in reference: {img_path}")
-                continue
-            vecs = [f.embedding for f in faces]
-            tmp.setdefault(label, []).append(np.mean(vecs, axis=0))
-            log_callback(f"✔️ Embedded '{label}' from {img_path}")
-        except Exception as e:
-            log_callback(f"❌ Error processing {img_path}: {e}")
+    # one pass over every reference, so decode-ahead doesn't stall at label boundaries
+    paths = [r[2] for r in references]
+    for i, img_path, emb in _embed_reference_images(app, paths, log_callback, db_path):
+        label = references[i][1]
+        tmp.setdefault(label, []).append(emb)
+        _log_detail(log_callback, f"✔️ Embedded '{label}' from {img_path}")
 
     for label, vecs in tmp.items():
         if vecs:
-            ref_embeddings[label] = np.mean(vecs, axis=0)
+            ref_embeddings[label] = _mean_of_image_means(vecs)
+    _refresh_ref_matrix()
 
     if not ref_embeddings:
         log_callback("⚠️ No valid embeddings were built. Check your reference images.")
@@ -402,97 +910,173 @@ def sort_photos_with_embeddings_from_folder_using_db(
     if app is None:
         return
 
+    # thresholds may have been edited since the last rebuild; K reads per run, not per face
+    _refresh_ref_thresholds()
+
+    _reset_dir_listings()
+    log_callback = _Logger(log_callback)
+    counts = {"sorted": 0, "unmatched": 0, "skipped": 0}
+
     log_callback(f"🔧 Match mode: {match_mode}")
     log_callback(f"📁 Walking inbox: {inbox_dir}")
 
-    for subdir, _, files in os.walk(inbox_dir):
-        if _should_stop():
-            log_callback("⛔ Stop requested. Finishing current item and exiting…")
-            break
-        for file in files:
+    def _inbox_images():
+        # scandir walk: DirEntry carries the type from the directory read, so no
+        # per-entry stat and no path re-joining; same top-down order as os.walk
+        stack = [inbox_dir]
+        while stack:
+            current = stack.pop()
+            subdirs = []
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.append(entry.path)
+                                continue
+                            name = entry.name
+                            dot = name.rfind(".")
+                            if dot >= 0 and name[dot + 1:].lower() in _INBOX_EXTS and entry.is_file():
+                                yield entry.path, name
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            stack.extend(reversed(subdirs))
+
+    def _to_unmatched(img_path, file):
+        try:
+            # move unreadable/unmatched images to unmatched, keep name (use collision-safe)
+            dst = _build_safe_destination(unmatched_dir, file, keep_original_filenames)
+            shutil.move(img_path, dst)
+            log_callback.detail(f"↪︎ Moved to unmatched: {os.path.basename(dst)}")
+        except Exception as move_e:
+            log_callback(f"⚠️ Could not move to unmatched: {move_e}")
+
+    # Decode runs ahead on a small pool while the main thread does inference
+    # (the ORT session stays on this thread). File moves/copies go to a single
+    # worker so they overlap the next forward pass but keep their order, which
+    # the collision-safe naming relies on.
+    images = _inbox_images()
+    pending = deque()
+    # nvJPEG only pays off when inference is on the GPU too
+    use_gpu = "CUDAExecutionProvider" in (_MODEL_CACHE["providers"] or ())
+    decode_pool = ThreadPoolExecutor(max_workers=_DECODE_WORKERS)
+    io_pool = ThreadPoolExecutor(max_workers=1)
+
+    def _io(fn, *args, **kwargs):
+        def _report(fut):
+            if fut.exception() is not None:
+                log_callback(f"❌ File operation failed: {fut.exception()}")
+        io_pool.submit(fn, *args, **kwargs).add_done_callback(_report)
+
+    def _fill():
+        while len(pending) < _DECODE_AHEAD:
+            nxt = next(images, None)
+            if nxt is None:
+                return
+            pending.append((nxt, decode_pool.submit(_load_inbox_image, nxt[0], use_gpu)))
+
+    def _dispatch(img_path, file, emb):
+        # Identify
+        labels_set, best_label, _scores = identify_embeddings(emb, file, log_callback, match_mode)
+
+        if not labels_set:
+            log_callback.detail(f"⚠️ No good match for {file}")
+            counts["unmatched"] += 1
+            _io(_to_unmatched, img_path, file)
+            return
+        counts["sorted"] += 1
+
+        # Distribute per requested mode:
+        #   "multi" → COPY to all other matches, then MOVE to best
+        #   anything else → treat as best
+        _io(
+            distribute_to_labels,
+            img_path, file, labels_set, best_label, output_dir, log_callback,
+            keep_original_filenames=keep_original_filenames,
+            mode="multi" if match_mode == "multi" else "best",
+        )
+
+    # Detection stays per image; recognition runs once per _EMBED_BATCH images
+    # over all of their aligned faces.
+    fast = _fast_path_models(app)
+    batch = []  # (img_path, file, crops) awaiting the batched embed
+
+    def _flush():
+        if not batch:
+            return
+        emb = _embed_crops(fast[1], [c for _p, _f, crops in batch for c in crops])
+        at = 0
+        for img_path, file, crops in batch:
+            _dispatch(img_path, file, emb[at:at + len(crops)])
+            at += len(crops)
+        batch.clear()
+
+    try:
+        _fill()
+        while pending:
             if _should_stop():
                 log_callback("⛔ Stop requested. Finishing current item and exiting…")
                 break
-            
-            if not file.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp")):
-                continue
+            (img_path, file), fut = pending.popleft()
+            _fill()
 
-            img_path = os.path.normpath(os.path.join(subdir, file))
-            if not os.path.isfile(img_path):
-                log_callback(f"⚠️ Skipping missing file (not found): {img_path}")
-                continue
-            
             # Load + detect
-                      
             try:
-                img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR)
-                if img is None:
-                    raise ValueError("Image unreadable")
+                img = fut.result()
+            except FileNotFoundError:
+                log_callback(f"⚠️ Skipping missing file (not found): {img_path}")
+                counts["skipped"] += 1
+                continue
+            except Exception as e:
+                log_callback(f"⚠️ Skipping {file}: {e}")
+                counts["skipped"] += 1
+                _io(_to_unmatched, img_path, file)
+                continue
 
-                faces = app.get(img)
+            done = sum(counts.values()) + len(batch)
+            if not log_callback.verbose and done and done % _PROGRESS_EVERY == 0:
+                log_callback(f"… {done} images processed")
+            try:
+                if fast:
+                    faces = _detect_aligned(fast[0], fast[1], img)
+                else:
+                    faces = app.get(img)
                 if not faces:
                     raise RuntimeError("No faces found")
             except Exception as e:
-                log_callback(f"⚠️ Skipping {file}: {e}")
-                try:
-                    # move unreadable images to unmatched, keep name (use collision-safe)
-                    dst = _build_safe_destination(unmatched_dir, file, keep_original_filenames)
-                    shutil.move(img_path, dst)
-                    log_callback(f"↪︎ Moved to unmatched: {os.path.basename(dst)}")
-                except Exception as move_e:
-                    log_callback(f"⚠️ Could not move to unmatched: {move_e}")
+                log_callback.detail(f"⚠️ Skipping {file}: {e}")
+                counts["unmatched"] += 1
+                _io(_to_unmatched, img_path, file)
                 continue
+            finally:
+                del img
 
             if _should_stop():
                 log_callback("⛔ Stop requested. Finishing current item and exiting…")
                 break
-  
 
             if match_mode == "manual":
-                log_callback(f"🛠️ Manual match mode not implemented yet for {file}")
-                try:
-                    dst = _build_safe_destination(unmatched_dir, file, keep_original_filenames)
-                    shutil.move(img_path, dst)
-                    log_callback(f"↪︎ Moved to unmatched: {os.path.basename(dst)}")
-                except Exception as move_e:
-                    log_callback(f"⚠️ Could not move to unmatched: {move_e}")
-                continue
-
-            if _should_stop():
-                log_callback("⛔ Stop requested. Finishing current item and exiting…")
-                break
-  
-            # Identify
-            labels_set, best_label, _scores = identify_faces(faces, file, log_callback, match_mode)
-
-            if not labels_set:
-                log_callback(f"⚠️ No good match for {file}")
-                try:
-                    dst = _build_safe_destination(unmatched_dir, file, keep_original_filenames)
-                    shutil.move(img_path, dst)
-                    log_callback(f"↪︎ Moved to unmatched: {os.path.basename(dst)}")
-                except Exception as move_e:
-                    log_callback(f"⚠️ Could not move to unmatched: {move_e}")
+                log_callback.detail(f"🛠️ Manual match mode not implemented yet for {file}")
+                counts["unmatched"] += 1
+                _io(_to_unmatched, img_path, file)
                 continue
 
-            # Distribute per requested mode:
-            if match_mode == "best":
-                distribute_to_labels(
-                    img_path, file, labels_set, best_label, output_dir, log_callback,
-                    keep_original_filenames=keep_original_filenames, mode="best"
-                )
-            elif match_mode == "multi":
-                # COPY to all other matches, then MOVE to best
-                distribute_to_labels(
-                    img_path, file, labels_set, best_label, output_dir, log_callback,
-                    keep_original_filenames=keep_original_filenames, mode="multi"
-                )
+            if fast:
+                batch.append((img_path, file, faces))
+                if len(batch) >= _EMBED_BATCH:
+                    _flush()
             else:
-                # Fallback: treat as best
-                distribute_to_labels(
-                    img_path, file, labels_set, best_label, output_dir, log_callback,
-                    keep_original_filenames=keep_original_filenames, mode="best"
-                )
+                _dispatch(img_path, file, np.stack([f.embedding for f in faces]))
+        _flush()  # detected images are "current items": finish them even on stop
+    finally:
+        for _item, fut in pending:
+            fut.cancel()
+        decode_pool.shutdown(wait=True)
+        io_pool.shutdown(wait=True)  # every queued move/copy lands before we return
+        log_callback(f"📊 Sorted {counts['sorted']} · unmatched {counts['unmatched']} · "
+                     f"skipped {counts['skipped']}")
 
 
 def identify_faces(faces, file, log_callback, match_mode):
@@ -502,34 +1086,35 @@ def identify_faces(faces, file, log_callback, match_mode):
       best_label: str|None (the label with highest score overall)
       label_scores: dict[label] -> best score (max across faces)
     """
-    label_scores = {}
-    matches = []  # (label, score) per-face best
-
-    for face in faces:
-        embedding = face.embedding
-        best_label = None
-        best_score = 0.0
-
-        for label, ref_emb in ref_embeddings.items():
-            score = cosine_similarity([embedding], [ref_emb])[0][0]
-            threshold = get_threshold_for_label(label)
-            if score >= threshold and score > best_score:
-                best_score = score
-                best_label = label
-
-        if best_label:
-            matches.append((best_label, best_score))
-            # keep the max score per label
-            label_scores[best_label] = max(label_scores.get(best_label, 0.0), best_score)
-            log_match_result(file, best_label, best_score, match_mode=match_mode)
-
-    if not matches:
-        return set(), None, label_scores
-
-    labels_set = set(lbl for (lbl, _) in matches)
-    # overall best label by score across faces
-    best_label_overall = max(label_scores.items(), key=lambda kv: kv[1])[0]
-    return labels_set, best_label_overall, label_scores
+    emb = np.stack([f.embedding for f in faces]) if faces else np.zeros((0, 512), dtype=np.float32)
+    return identify_embeddings(emb, file, log_callback, match_mode)
+
+
+def identify_embeddings(emb, file, log_callback, match_mode):
+    """identify_faces() on raw [F, D] face embeddings (one row per face)."""
+    if not len(emb) or not _ref_labels:
+        return set(), None, {}
+
+    # cosine similarity for every (face, label) pair; a label qualifies
+    # at/above its threshold and, like before, never at <= 0
+    emb = _l2_normalize(np.asarray(emb, dtype=np.float32))
+    best_idx, best_scores = score_batch(emb, _ref_matrix, _ref_thresholds)
+    hit = np.flatnonzero(best_idx >= 0)
+    if not hit.size:
+        return set(), None, {}
+
+    # each matched face votes for its own best label; per label keep the max
+    # score across those faces (scores are > 0, so 0 means "no votes")
+    per_label = np.zeros(len(_ref_labels), dtype=np.float32)
+    np.maximum.at(per_label, best_idx[hit], best_scores[hit])
+    voted = np.flatnonzero(per_label > 0.0)
+    label_scores = {_ref_labels[k]: float(per_label[k]) for k in voted}
+    best_label_overall = _ref_labels[int(per_label.argmax())]
+
+    for face_i in hit:
+        log_match_result(file, _ref_labels[best_idx[face_i]], float(best_scores[face_i]),
+                         match_mode=match_mode)
+    return set(label_scores), best_label_overall, label_scores
 
 
 def copy_to_label_dirs(img_path, filename, labels, output_dir, log_callback):
@@ -0,0 +1,98 @@
+# thumb_disk_cache.py
+# Persistent thumbnail cache so a restart doesn't re-decode every photo.
+# Entries live under ~/.cache/photo-sorter/thumbs/<hh>/<rest>.webp and are keyed
+# by (abspath, mtime_ns, size) — editing or replacing a file changes its key.
+
+import os
+import uuid
+import shutil
+import hashlib
+
+from PIL import Image
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "photo-sorter", "thumbs")
+MAX_BYTES = 500 * 1024 * 1024  # prune() trims least-recently-used entries past this
+
+
+def _cache_path(path: str, size) -> str | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{size}".encode("utf-8")
+    digest = hashlib.blake2b(raw).hexdigest()[:24]
+    # 2-char fan-out keeps each directory small
+    return os.path.join(CACHE_DIR, digest[:2], digest[2:] + ".webp")
+
+
+def get(path: str, size):
+    """Return the cached RGB thumbnail for `path` at `size`, or None."""
+    cp = _cache_path(path, size)
+    if not cp or not os.path.exists(cp):
+        return None
+    try:
+        with Image.open(cp) as im:
+            im = im.convert("RGB")
+    except Exception:
+        return None
+    try:
+        os.utime(cp)  # explicit LRU stamp; relatime/noatime mounts won't do it for us
+    except OSError:
+        pass
+    return im
+
+
+def put(path: str, size, im) -> None:
+    """Store `im` as the thumbnail for `path` at `size`. Failures are ignored."""
+    cp = _cache_path(path, size)
+    if not cp:
+        return
+    tmp = f"{cp}.{uuid.uuid4().hex}.tmp"  # unique per writer: pool threads share one pid
+    try:
+        os.makedirs(os.path.dirname(cp), exist_ok=True)
+        im.save(tmp, "WEBP", quality=82, method=4)
+        os.replace(tmp, cp)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def prune(max_bytes: int = MAX_BYTES) -> int:
+    """Delete least-recently-used entries until the cache fits `max_bytes`. Returns files removed."""
+    entries = []
+    total = 0
+    try:
+        with os.scandir(CACHE_DIR) as buckets:
+            for b in buckets:
+                if not b.is_dir(follow_symlinks=False):
+                    continue
+                with os.scandir(b.path) as files:
+                    for f in files:
+                        try:
+                            st = f.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        entries.append((max(st.st_atime, st.st_mtime), st.st_size, f.path))
+                        total += st.st_size
+    except OSError:
+        return 0
+    if total <= max_bytes:
+        return 0
+    removed = 0
+    for _t, size, fp in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(fp)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def clear() -> None:
+    """Remove every cached thumbnail."""
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,61 @@
+# utils_numba.py
+# Optional Numba kernel for scoring face embeddings against a handful of labels.
+# Falls back to plain numpy when numba is not installed.
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except Exception:  # pragma: no cover
+    HAVE_NUMBA = False
+
+
+if HAVE_NUMBA:
+    @njit(fastmath=True, cache=True)
+    def _score_batch_jit(E, R, thresholds):
+        F, D = E.shape
+        K = R.shape[0]
+        best_idx = np.full(F, -1, dtype=np.int64)
+        best_score = np.zeros(F, dtype=np.float32)
+        for i in range(F):
+            top = np.float32(0.0)
+            for k in range(K):
+                s = np.float32(0.0)
+                for d in range(D):
+                    s += E[i, d] * R[k, d]
+                if s >= thresholds[k] and s > 0.0 and (best_idx[i] < 0 or s > top):
+                    top = s
+                    best_idx[i] = k
+            best_score[i] = top
+        return best_idx, best_score
+
+
+def _score_batch_np(E, R, thresholds):
+    scores = E @ R.T
+    ok = (scores >= thresholds[None, :]) & (scores > 0.0)
+    masked = np.where(ok, scores, -np.inf)
+    best_idx = masked.argmax(axis=1)
+    best_score = masked[np.arange(len(E)), best_idx].astype(np.float32)
+    hit = ok.any(axis=1)
+    best_idx[~hit] = -1
+    best_score[~hit] = 0.0
+    return best_idx, best_score
+
+
+SMALL_K = 16  # below this many labels the jitted loop beats a BLAS call's overhead
+
+
+def score_batch(E, R, thresholds):
+    """
+    Thresholded cosine argmax of unit rows E [F, D] against unit rows R [K, D].
+    Returns (best_idx, best_score) per face; best_idx is -1 where no label
+    reaches its threshold (scores <= 0 never match). Uses the jitted kernel
+    for small K when numba is available, a numpy GEMM otherwise.
+    """
+    if HAVE_NUMBA and R.shape[0] < SMALL_K:
+        return _score_batch_jit(np.ascontiguousarray(E, dtype=np.float32),
+                                np.ascontiguousarray(R, dtype=np.float32),
+                                np.ascontiguousarray(thresholds, dtype=np.float32))
+    return _score_batch_np(E, R, thresholds)
+